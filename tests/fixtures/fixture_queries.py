@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture
+def strict_query_budget(settings):
+    """Превышение бюджета запросов view или повтор SQL валит тест."""
+    settings.QUERY_BUDGET_STRICT = True
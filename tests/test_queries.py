@@ -0,0 +1,24 @@
+import pytest
+from django.core.cache import cache
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestQueryBudget:
+
+    def test_feeds_within_budget(self, strict_query_budget, user_client,
+                                 another_few_posts_with_group_with_follower,
+                                 few_posts_with_group):
+        urls = (
+            '/',
+            f'/group/{few_posts_with_group.group.slug}/',
+            f'/profile/{few_posts_with_group.author.username}/',
+            f'/posts/{few_posts_with_group.id}/',
+            '/follow/',
+        )
+        for url in urls:
+            cache.clear()
+            response = user_client.get(url)
+            assert response.status_code == 200, (
+                f'Страница `{url}` работает неправильно'
+            )
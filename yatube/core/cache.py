@@ -0,0 +1,35 @@
+from django.core.cache.backends.locmem import LocMemCache
+
+from core import metrics
+
+missing = object()
+
+
+def cache_kind(key):
+    """
+    Тип и имя закэшированного объекта по ключу: страницы cache_page
+    с их key_prefix и фрагменты шаблонного тега {% cache %}.
+    """
+    parts = key.split('.')
+    if key.startswith('views.decorators.cache.cache_page.'):
+        return 'page', parts[4], True
+    if key.startswith('views.decorators.cache.cache_header.'):
+        # Промах по заголовкам значит, что страницу даже не искали.
+        return 'page', parts[4], False
+    if key.startswith('template.cache.'):
+        return 'fragment', parts[2], True
+    return None, None, False
+
+
+class MetricsLocMemCache(LocMemCache):
+    """LocMemCache, считающий попадания и промахи страниц и фрагментов."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, missing, version)
+        kind, name, count_hits = cache_kind(key)
+        if kind is not None and (value is missing or count_hits):
+            metrics.cache_requests.inc(
+                kind=kind, name=name,
+                result='miss' if value is missing else 'hit'
+            )
+        return default if value is missing else value
@@ -0,0 +1,23 @@
+from django.template.context import make_context
+from django.template.loader import get_template
+from django.template.loader_tags import BlockNode
+
+
+def find_block(template, name):
+    for node in template.nodelist.get_nodes_by_type(BlockNode):
+        if node.name == name:
+            return node
+    raise LookupError(f'{template.origin.name}: нет блока {name}')
+
+
+def render_block(request, template_name, block_name, context):
+    """
+    Рендерит только один {% block %} шаблона в его собственном
+    контексте запроса: ни родительский шаблон, ни остальные блоки
+    не рендерятся.
+    """
+    template = get_template(template_name).template
+    block = find_block(template, block_name)
+    context = make_context(context, request)
+    with context.bind_template(template):
+        return block.render(context)
@@ -0,0 +1,70 @@
+from django.template import Template, TemplateDoesNotExist
+from django.template.base import NodeList
+from django.template.loaders import base, cached
+from django.templatetags.cache import CacheNode
+
+from .middleware.templates import timed
+
+
+class TimedNodeList(NodeList):
+    """Корневой список узлов шаблона, замеряющий свой рендер."""
+
+    def render(self, context):
+        with timed(self.template_name):
+            return super().render(context)
+
+
+def timed_cache_render(node):
+    render = node.render
+
+    def timed_render(context):
+        with timed(f'cache:{node.fragment_name}'):
+            return render(context)
+    return timed_render
+
+
+class TimedTemplate(Template):
+    """
+    Шаблон, который замеряет свой рендер и рендер своих блоков
+    {% cache %}. Замер стоит на корневом nodelist, а не на
+    Template._render: _render в тестах заменяет Django, а {% extends %}
+    вызывает _render родителя в обход Template.render.
+    """
+
+    def compile_nodelist(self):
+        nodelist = super().compile_nodelist()
+        for node in nodelist.get_nodes_by_type(CacheNode):
+            node.render = timed_cache_render(node)
+        timed_nodelist = TimedNodeList(nodelist)
+        timed_nodelist.contains_nontext = nodelist.contains_nontext
+        timed_nodelist.template_name = self.name or '<string>'
+        return timed_nodelist
+
+
+class TimedSourcesLoader(base.Loader):
+    """base.Loader, собирающий TimedTemplate вместо Template."""
+
+    def get_template(self, template_name, skip=None):
+        tried = []
+        for origin in self.get_template_sources(template_name):
+            if skip is not None and origin in skip:
+                tried.append((origin, 'Skipped'))
+                continue
+            try:
+                contents = self.get_contents(origin)
+            except TemplateDoesNotExist:
+                tried.append((origin, 'Source does not exist'))
+                continue
+            return TimedTemplate(
+                contents, origin, origin.template_name, self.engine
+            )
+        raise TemplateDoesNotExist(template_name, tried=tried)
+
+
+class Loader(cached.Loader, TimedSourcesLoader):
+    """
+    Кэширующий загрузчик шаблонов для TEMPLATE_TIMING: оборачивает
+    обычные загрузчики, как django.template.loaders.cached.Loader, но
+    отдаёт шаблоны с замером рендера. Сам Django не подменяется,
+    остальные движки и шаблоны из строк не затрагиваются.
+    """
@@ -0,0 +1,96 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+default_limit: int = 25
+importtime_re = re.compile(
+    r'^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \| (?P<name>.*)$'
+)
+# Выполняется в отдельном процессе, чтобы импорты считались с нуля.
+boot_script = '''
+import json
+import time
+
+started = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+from core.startup import preload
+preload()
+print(json.dumps({
+    'django.setup()': setup - started,
+    'preload()': time.perf_counter() - setup,
+}))
+'''
+
+
+def parse_importtime(output):
+    """Строки -X importtime: (модуль, собственное, накопленное) в мкс."""
+    modules = []
+    for line in output.splitlines():
+        match = importtime_re.match(line)
+        if match:
+            modules.append((
+                match['name'].strip(),
+                int(match['self']),
+                int(match['cumulative']),
+            ))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает загрузку воркера в отдельном процессе с '
+        'python -X importtime и показывает, какие модули дороже всего '
+        'импортировать, и сколько занимают django.setup() и предзагрузка.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=default_limit,
+            help='Сколько модулей показать.'
+        )
+        parser.add_argument(
+            '--packages', action='store_true',
+            help='Складывать собственное время по пакетам верхнего уровня.'
+        )
+
+    def handle(self, *args, **options):
+        env = dict(
+            os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE
+        )
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', boot_script],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        if result.returncode:
+            raise CommandError(result.stderr)
+        modules = parse_importtime(result.stderr)
+        total = sum(own for _, own, _ in modules)
+        for phase, seconds in json.loads(result.stdout).items():
+            self.stdout.write(f'{phase:20} {seconds * 1000:8.1f} мс')
+        self.stdout.write(
+            f'{"импорт всего":20} {total / 1000:8.1f} мс, '
+            f'{len(modules)} модулей'
+        )
+        if options['packages']:
+            packages = defaultdict(int)
+            for name, own, _ in modules:
+                packages[name.split('.')[0]] += own
+            rows = sorted(
+                ((name, own, own) for name, own in packages.items()),
+                key=lambda row: row[2], reverse=True
+            )
+        else:
+            rows = sorted(modules, key=lambda row: row[2], reverse=True)
+        self.stdout.write(f'{"модуль":50} {"своё, мс":>10} {"всего, мс":>10}')
+        for name, own, cumulative in rows[:options['limit']]:
+            self.stdout.write(
+                f'{name:50} {own / 1000:10.1f} {cumulative / 1000:10.1f}'
+            )
@@ -0,0 +1,70 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.tasks import lease_timeout, release_stale, work
+
+default_threads: int = 4
+default_batch_size: int = 20
+default_poll_interval: float = 1.0
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает обработчик фоновых задач из таблицы core.Task. '
+        'Для нескольких процессов запустите команду несколько раз.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=default_threads,
+            help='Количество потоков обработчика.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=default_batch_size,
+            help='Сколько задач поток забирает за один раз.'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=default_poll_interval,
+            help='Пауза между опросами пустой очереди, в секундах.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь в текущем потоке и выйти.'
+        )
+
+    def handle(self, *args, **options):
+        release_stale()
+        if options['once']:
+            work(options['batch_size'], once=True)
+            return
+        stop_event = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop_event.set())
+        threads = [
+            threading.Thread(
+                target=self.run_thread,
+                args=(
+                    options['batch_size'],
+                    stop_event,
+                    options['poll_interval']
+                ),
+                daemon=True
+            )
+            for _ in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f'Запущено потоков: {len(threads)}')
+        while not stop_event.wait(lease_timeout / 2):
+            release_stale()
+        for thread in threads:
+            thread.join()
+
+    def run_thread(self, limit, stop_event, poll_interval):
+        try:
+            work(limit, stop_event, poll_interval)
+        finally:
+            connection.close()
@@ -0,0 +1,100 @@
+import json
+import os
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+default_limit: int = 20
+sort_keys: tuple = ('total', 'count', 'max')
+
+
+def read_entries(path):
+    """Записи журнала и его ротированных копий, битые строки пропускаются."""
+    paths = [path] + [
+        f'{path}.{number}' for number in range(1, 100)
+        if os.path.exists(f'{path}.{number}')
+    ]
+    for log_path in paths:
+        if not os.path.exists(log_path):
+            continue
+        with open(log_path, encoding='utf-8') as log:
+            for line in log:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def group_entries(entries):
+    groups = defaultdict(lambda: {
+        'count': 0,
+        'total': 0.0,
+        'max': 0.0,
+        'views': Counter(),
+        'sources': Counter(),
+        'slowest': None,
+    })
+    for entry in entries:
+        group = groups[entry['fingerprint']]
+        duration = entry['duration_ms']
+        group['count'] += 1
+        group['total'] += duration
+        group['views'][entry['view'] or '-'] += 1
+        group['sources'][entry['source'] or '-'] += 1
+        if duration >= group['max']:
+            group['max'] = duration
+            group['slowest'] = entry
+    return groups
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка журнала медленных SQL-запросов: запросы группируются по '
+        'отпечатку без литералов, для каждой группы показываются view, '
+        'место вызова в коде и план самого медленного выполнения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log', default=settings.SLOW_QUERY_LOG,
+            help='Путь к журналу медленных запросов.'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=default_limit,
+            help='Сколько групп показать.'
+        )
+        parser.add_argument(
+            '--sort', choices=sort_keys, default='total',
+            help='Порядок: суммарное время, число или максимум.'
+        )
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['log']):
+            raise CommandError(f'Журнал не найден: {options["log"]}')
+        groups = group_entries(read_entries(options['log']))
+        if not groups:
+            self.stdout.write('Медленных запросов нет')
+            return
+        ordered = sorted(
+            groups.items(), key=lambda item: item[1][options['sort']],
+            reverse=True
+        )
+        for fingerprint, group in ordered[:options['limit']]:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{group["count"]} раз, всего {group["total"]:.0f} мс, '
+                f'среднее {group["total"] / group["count"]:.1f} мс, '
+                f'максимум {group["max"]:.1f} мс'
+            ))
+            self.stdout.write(f'  {fingerprint}')
+            for label, counter in (
+                ('view', group['views']), ('код', group['sources'])
+            ):
+                for name, count in counter.most_common(3):
+                    self.stdout.write(f'  {label}: {name} ({count})')
+            plan = group['slowest']['plan']
+            if plan:
+                self.stdout.write('  план:')
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+            self.stdout.write('')
@@ -0,0 +1,136 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import (
+    FileResponse, HttpResponse, HttpResponseNotModified
+)
+from django.utils.http import http_date, parse_etags
+from django.views.static import was_modified_since
+
+range_re = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    """
+    Файл, из которого можно прочитать только length байт начиная со start.
+    fileno() намеренно нет: wsgi.file_wrapper некоторых серверов (uWSGI)
+    отправляет дескриптор через sendfile до конца файла, не зная о длине
+    диапазона. Без fileno кусок читается через read(); целые файлы
+    по-прежнему уходят через sendfile.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def file_etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """
+    Разбирает заголовок Range с одним диапазоном и возвращает пару
+    (start, end) включительно; start >= size означает невыполнимый
+    диапазон. Для нескольких диапазонов и мусора возвращает None:
+    такой запрос обслуживается целиком.
+    """
+    match = range_re.match(header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        suffix = int(last)
+        if suffix == 0:
+            return size, size - 1
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    if start >= size:
+        return size, size - 1
+    end = min(int(last), size - 1) if last else size - 1
+    if end < start:
+        return None
+    return start, end
+
+
+def is_not_modified(request, etag, stat):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags
+    return not was_modified_since(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'),
+        stat.st_mtime,
+        stat.st_size
+    )
+
+
+def serve_file(request, path, content_type=None):
+    """
+    Отдаёт файл потоком через FileResponse с поддержкой ETag,
+    If-None-Match, If-Modified-Since и одиночных диапазонов Range.
+    """
+    stat = os.stat(path)
+    etag = file_etag(stat)
+    last_modified = http_date(stat.st_mtime)
+    if is_not_modified(request, etag, stat):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    content_type = (
+        content_type
+        or mimetypes.guess_type(path)[0]
+        or 'application/octet-stream'
+    )
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    range_allowed = if_range in (None, etag, last_modified)
+    if 'HTTP_RANGE' in request.META and range_allowed:
+        byte_range = parse_range(request.META['HTTP_RANGE'], stat.st_size)
+    if byte_range is not None and byte_range[0] >= stat.st_size:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+    file = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(
+            RangeFile(file, start, length),
+            content_type=content_type,
+            status=206
+        )
+        response['Content-Length'] = length
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    return response
+
+
+def accel_redirect(name):
+    """Передаёт отдачу файла nginx через внутренний location."""
+    response = HttpResponse(
+        content_type=mimetypes.guess_type(name)[0]
+        or 'application/octet-stream'
+    )
+    response['X-Accel-Redirect'] = (
+        settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(name)
+    )
+    return response
@@ -0,0 +1,327 @@
+import fcntl
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from collections import defaultdict
+
+from django.conf import settings
+
+flush_interval: float = 5.0
+retained_file: str = 'retained.json'
+lock_file: str = '.lock'
+process_file_re = re.compile(r'^(\d+)(?:-[0-9a-f]+)?\.json$')
+default_buckets: tuple = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+size_buckets: tuple = (
+    10 ** 4, 10 ** 5, 5 * 10 ** 5, 10 ** 6, 2 * 10 ** 6, 5 * 10 ** 6
+)
+memory_buckets: tuple = (
+    10 ** 5, 10 ** 6, 5 * 10 ** 6, 10 ** 7, 5 * 10 ** 7, 10 ** 8
+)
+
+registry = {}
+
+
+class ThreadMarker:
+    """Метка в threading.local, по сборке которой виден конец потока."""
+
+
+class Store:
+    """
+    Значения метрик процесса. Каждый поток пишет в свой словарь, поэтому
+    запись обходится без замков; при выгрузке словари потоков
+    складываются. Когда поток завершается, его словарь вливается в общий
+    base, так что число словарей не растёт с числом обслуженных
+    соединений. С METRICS_DIR снимок процесса периодически атомарно
+    записывается в файл <pid>-<метка>.json, а выгрузка суммирует файлы
+    всех процессов — так gunicorn с несколькими воркерами отдаёт общие
+    цифры. Метка уникальна для процесса, поэтому воркер, получивший pid
+    умершего, не затирает его файл; файлы умерших процессов выгрузка
+    вливает в retained.json и удаляет.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.base = defaultdict(float)
+        self.threads = {}
+        self.pid = os.getpid()
+        self.token = uuid.uuid4().hex
+        self.next_flush = 0.0
+
+    def values(self):
+        if self.pid != os.getpid():
+            # После fork значения родителя уже учтены в его файле.
+            self.reset()
+        values = getattr(self.local, 'values', None)
+        if values is None:
+            values = self.local.values = defaultdict(float)
+            # Данные threading.local удаляются вместе с потоком, и тогда
+            # срабатывает финализатор метки.
+            self.local.marker = marker = ThreadMarker()
+            weakref.finalize(marker, self.retire, self.lock, values)
+            with self.lock:
+                self.threads[id(values)] = values
+        return values
+
+    def retire(self, lock, values):
+        if lock is not self.lock:
+            # Поток пережил reset(): его значения уже не нужны.
+            return
+        with lock:
+            for key, value in values.items():
+                self.base[key] += value
+            self.threads.pop(id(values), None)
+
+    def add(self, key, amount):
+        self.values()[key] += amount
+
+    def snapshot(self):
+        with self.lock:
+            total = defaultdict(float, self.base)
+            threads = list(self.threads.values())
+        for values in threads:
+            for key, value in dict(values).items():
+                total[key] += value
+        return total
+
+    def path(self):
+        return os.path.join(
+            settings.METRICS_DIR, f'{self.pid}-{self.token}.json'
+        )
+
+    def flush(self, force=False):
+        if not settings.METRICS_DIR:
+            return
+        now = time.monotonic()
+        if not force and now < self.next_flush:
+            return
+        self.next_flush = now + flush_interval
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        samples = [
+            [name, labels, value]
+            for (name, labels), value in self.snapshot().items()
+        ]
+        write_samples(self.path(), samples)
+
+    def collect(self):
+        """
+        Сумма значений всех процессов, включая свежие значения этого.
+        Выгрузки разных процессов не пересекаются: их держит flock.
+        """
+        if not settings.METRICS_DIR:
+            return self.snapshot()
+        self.flush(force=True)
+        lock_path = os.path.join(settings.METRICS_DIR, lock_file)
+        with open(lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self.retire_dead()
+                total = defaultdict(float)
+                for entry in os.scandir(settings.METRICS_DIR):
+                    if entry.name.endswith('.json'):
+                        add_samples(total, read_samples(entry.path))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return total
+
+    def retire_dead(self):
+        """Вливает файлы умерших процессов в retained.json и удаляет их."""
+        dead = []
+        for entry in os.scandir(settings.METRICS_DIR):
+            match = process_file_re.match(entry.name)
+            if match and not process_alive(int(match.group(1))):
+                dead.append(entry.path)
+        if not dead:
+            return
+        retained_path = os.path.join(settings.METRICS_DIR, retained_file)
+        total = defaultdict(float)
+        for path in [retained_path] + dead:
+            add_samples(total, read_samples(path))
+        write_samples(retained_path, [
+            [name, labels, value] for (name, labels), value in total.items()
+        ])
+        for path in dead:
+            os.remove(path)
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_samples(path):
+    try:
+        with open(path) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return []
+
+
+def write_samples(path, samples):
+    directory = os.path.dirname(path)
+    descriptor, temporary = tempfile.mkstemp(dir=directory)
+    with os.fdopen(descriptor, 'w') as output:
+        json.dump(samples, output)
+    os.replace(temporary, path)
+
+
+def add_samples(total, samples):
+    for name, labels, value in samples:
+        total[name, tuple(map(tuple, labels))] += value
+
+
+store = Store()
+
+
+class Metric:
+    kind = ''
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry[name] = self
+
+    def labels(self, values):
+        return tuple(
+            (name, str(values[name])) for name in self.labelnames
+        )
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        store.add((self.name, self.labels(labels)), amount)
+
+
+class Histogram(Metric):
+    """Гистограмма с накопленными корзинами, как в формате Prometheus."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=default_buckets):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        labels = self.labels(labels)
+        values = store.values()
+        for bound in self.buckets:
+            if value <= bound:
+                key = labels + (('le', format_value(bound)),)
+                values[f'{self.name}_bucket', key] += 1
+        values[f'{self.name}_sum', labels] += value
+        values[f'{self.name}_count', labels] += 1
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def escape(value):
+    return (
+        value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+    )
+
+
+def sample_order(sample):
+    """Корзины гистограммы идут по возрастанию границы, а не как строки."""
+    labels, value = sample
+    return tuple(
+        (label, float(text.replace('+Inf', 'inf')) if label == 'le' else text)
+        for label, text in labels
+    )
+
+
+def render():
+    """Текстовый формат выгрузки Prometheus 0.0.4."""
+    samples = defaultdict(list)
+    for (name, labels), value in store.collect().items():
+        samples[name].append((labels, value))
+    lines = []
+    for metric in registry.values():
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        names = [metric.name]
+        if metric.kind == 'histogram':
+            names = [
+                f'{metric.name}_{suffix}'
+                for suffix in ('bucket', 'sum', 'count')
+            ]
+        for name in names:
+            for labels, value in sorted(samples[name], key=sample_order):
+                label_text = ','.join(
+                    f'{label}="{escape(text)}"' for label, text in labels
+                )
+                if label_text:
+                    label_text = '{' + label_text + '}'
+                lines.append(f'{name}{label_text} {format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+http_requests = Counter(
+    'yatube_http_requests_total', 'Число обработанных запросов.',
+    ('view', 'method', 'status')
+)
+http_request_duration = Histogram(
+    'yatube_http_request_duration_seconds', 'Время ответа view.', ('view',)
+)
+db_query_duration = Histogram(
+    'yatube_db_query_duration_seconds',
+    'Суммарное время SQL-запросов одного запроса.', ('view',)
+)
+db_queries = Counter(
+    'yatube_db_queries_total', 'Число SQL-запросов.', ('view',)
+)
+cache_requests = Counter(
+    'yatube_cache_requests_total',
+    'Обращения к кэшу страниц и фрагментов шаблонов.',
+    ('kind', 'name', 'result')
+)
+template_render_duration = Histogram(
+    'yatube_template_render_seconds',
+    'Собственное время рендера шаблона или блока за запрос.', ('template',)
+)
+request_peak_memory = Histogram(
+    'yatube_request_peak_memory_bytes',
+    'Пик памяти Python за запрос по данным tracemalloc.', ('view',),
+    buckets=memory_buckets
+)
+startup_duration = Histogram(
+    'yatube_startup_seconds',
+    'Время от старта воркера до фазы запуска.', ('phase',)
+)
+compressed_responses = Counter(
+    'yatube_compressed_responses_total',
+    'Сжатые ответы по кодировке; precompressed — взятые готовыми из кэша.',
+    ('encoding', 'precompressed')
+)
+thumbnail_duration = Histogram(
+    'yatube_thumbnail_duration_seconds',
+    'Время построения уменьшенной копии картинки.'
+)
+upload_size = Histogram(
+    'yatube_upload_size_bytes', 'Размер загруженных файлов.',
+    buckets=size_buckets
+)
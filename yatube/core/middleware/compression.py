@@ -0,0 +1,177 @@
+import gzip
+import re
+import zlib
+from functools import wraps
+
+from django.utils.cache import patch_vary_headers
+
+from core import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+min_size: int = 512
+# Уровни для заранее сжатых страниц: сжатие идёт раз на заполнение кэша.
+precompressed_gzip_level: int = 9
+precompressed_brotli_quality: int = 11
+# Уровни для сжатия на лету в каждом ответе.
+gzip_level: int = 6
+brotli_quality: int = 5
+compressible_types: tuple = (
+    'text/', 'application/json', 'application/javascript',
+    'application/xml', 'image/svg+xml',
+)
+accept_encoding_re = re.compile(
+    r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$'
+)
+
+
+def gzip_compress(content, level):
+    # mtime=0 даёт одинаковые байты для одинакового тела, как в Django.
+    return gzip.compress(content, compresslevel=level, mtime=0)
+
+
+def brotli_compress(content, quality):
+    return brotli.compress(content, quality=quality)
+
+
+def gzip_stream(chunks):
+    """
+    Сжимает поток по частям. Каждая часть дожимается Z_SYNC_FLUSH,
+    чтобы браузер получал начало страницы сразу, а не после того,
+    как наполнится внутренний буфер компрессора.
+    """
+    compressor = zlib.compressobj(
+        gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+    )
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        yield data + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def brotli_stream(chunks):
+    compressor = brotli.Compressor(quality=brotli_quality)
+    for chunk in chunks:
+        yield compressor.process(chunk) + compressor.flush()
+    yield compressor.finish()
+
+
+def compress(response, encoding):
+    """Сжимает тело ответа на лету."""
+    if response.streaming:
+        stream = brotli_stream if encoding == 'br' else gzip_stream
+        response.streaming_content = stream(response.streaming_content)
+        del response['Content-Length']
+    elif encoding == 'br':
+        response.content = brotli_compress(response.content, brotli_quality)
+    else:
+        response.content = gzip_compress(response.content, gzip_level)
+
+
+def supported_encodings():
+    """Поддерживаемые кодировки в порядке предпочтения."""
+    if brotli is None:
+        return ('gzip',)
+    return ('br', 'gzip')
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding и их q."""
+    accepted = {}
+    for part in header.split(','):
+        match = accept_encoding_re.match(part)
+        if not match:
+            continue
+        name, quality = match.groups()
+        try:
+            accepted[name.lower()] = float(quality or 1)
+        except ValueError:
+            continue
+    return accepted
+
+
+def choose_encoding(header):
+    """Первая поддерживаемая кодировка, которую клиент не запретил q=0."""
+    accepted = accepted_encodings(header)
+    for encoding in supported_encodings():
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def is_compressible(response):
+    return (
+        response.status_code == 200
+        and not response.has_header('Content-Encoding')
+        and response.get('Content-Type', '').startswith(compressible_types)
+    )
+
+
+def precompressed(view_func):
+    """
+    Сжимает ответ view всеми поддерживаемыми кодировками и кладёт
+    результат в атрибут encodings ответа. Декоратор ставится под
+    cache_page: атрибут сохраняется в кэше вместе со страницей, и
+    CompressionMiddleware отдаёт готовые байты без повторного сжатия.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        response = view_func(request, *args, **kwargs)
+        if (
+            response.streaming or not is_compressible(response)
+            or len(response.content) < min_size
+        ):
+            return response
+        response.encodings = {
+            'gzip': gzip_compress(response.content, precompressed_gzip_level)
+        }
+        if brotli is not None:
+            response.encodings['br'] = brotli_compress(
+                response.content, precompressed_brotli_quality
+            )
+        return response
+    return wrapper
+
+
+class CompressionMiddleware:
+    """
+    Сжимает текстовые ответы в br или gzip по Accept-Encoding. Ответы
+    из precompressed отдаются готовыми байтами, остальные сжимаются на
+    лету, потоковые — по частям. Маленькие, уже сжатые и несжимаемые
+    ответы (картинки, диапазоны файлов) уходят как есть.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not is_compressible(response):
+            return response
+        if not response.streaming and len(response.content) < min_size:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if encoding is None:
+            return response
+        encodings = getattr(response, 'encodings', {})
+        if encoding in encodings:
+            response.content = encodings[encoding]
+        else:
+            compress(response, encoding)
+        metrics.compressed_responses.inc(
+            encoding=encoding, precompressed=encoding in encodings
+        )
+        if not response.streaming:
+            response['Content-Length'] = str(len(response.content))
+        # Сжатое тело побайтно отличается, поэтому ETag становится слабым.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
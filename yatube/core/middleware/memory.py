@@ -0,0 +1,76 @@
+import logging
+import tracemalloc
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+traced_frames: int = 10
+top_allocations: int = 10
+snapshot_filters = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+def memory_budget(limit):
+    """Объявляет, сколько байт памяти view может занять на пике."""
+    def decorator(view_func):
+        view_func.memory_budget = limit
+        return view_func
+    return decorator
+
+
+class MemoryStats:
+    def __init__(self, peak, growth, top):
+        self.peak = peak
+        self.growth = growth
+        self.top = top
+
+
+class MemoryProfilerMiddleware:
+    """
+    Снимает снимки tracemalloc до и после запроса: пик памяти,
+    прирост и места, где выделено больше всего памяти. Пик уходит
+    в метрики, превышение бюджета view (или MEMORY_BUDGET) пишется в лог
+    вместе с местами выделений. Снимки дорогие, а tracemalloc общий на
+    процесс, поэтому middleware включается только через
+    MEMORY_PROFILING и честные цифры даёт в однопоточном воркере.
+    """
+
+    def __init__(self, get_response):
+        if not settings.MEMORY_PROFILING:
+            raise MiddlewareNotUsed
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(traced_frames)
+        self.get_response = get_response
+
+    def __call__(self, request):
+        before = tracemalloc.take_snapshot().filter_traces(snapshot_filters)
+        started = tracemalloc.get_traced_memory()[0]
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        response = self.get_response(request)
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot().filter_traces(snapshot_filters)
+        stats = request.memory_stats = MemoryStats(
+            peak=peak - started,
+            growth=current - started,
+            top=after.compare_to(before, 'lineno')[:top_allocations]
+        )
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        metrics.request_peak_memory.observe(stats.peak, view=view_name)
+        budget = settings.MEMORY_BUDGET
+        if match:
+            budget = getattr(match.func, 'memory_budget', budget)
+        if stats.peak > budget:
+            logger.warning(
+                '%s: peak %d KiB, budget %d KiB\n%s', view_name,
+                stats.peak // 1024, budget // 1024,
+                '\n'.join(str(stat) for stat in stats.top)
+            )
+        return response
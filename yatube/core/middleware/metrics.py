@@ -0,0 +1,31 @@
+import time
+
+from core import metrics
+
+
+class MetricsMiddleware:
+    """
+    Считает запросы и время ответа по view_name, а также число и время
+    SQL-запросов из замеров QueryBudgetMiddleware. Должен стоять перед
+    ним, чтобы request.query_stats был готов к концу запроса.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.http_requests.inc(
+            view=view, method=request.method, status=response.status_code
+        )
+        metrics.http_request_duration.observe(duration, view=view)
+        query_stats = getattr(request, 'query_stats', None)
+        if query_stats is not None:
+            metrics.db_queries.inc(query_stats.count, view=view)
+            metrics.db_query_duration.observe(query_stats.duration, view=view)
+        metrics.store.flush()
+        return response
@@ -0,0 +1,142 @@
+import cProfile
+import os
+import re
+import sys
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import reverse
+
+profile_param: str = '_profile'
+profile_header: str = 'HTTP_X_PROFILE'
+sample_interval: float = 0.005
+kept_profiles: int = 100
+profile_name_re = re.compile(r'^[0-9a-f]{32}\.(prof|collapsed)$')
+
+
+class StackSampler:
+    """
+    Раз в interval секунд снимает стек потока, обрабатывающего запрос,
+    и копит его в свёрнутом виде (collapsed stacks) для flamegraph.
+    В отличие от cProfile почти не замедляет сам запрос.
+    """
+
+    extension = 'collapsed'
+
+    def __init__(self, interval=sample_interval):
+        self.interval = interval
+        self.stacks = Counter()
+
+    def sample(self, thread_id):
+        frame = sys._current_frames().get(thread_id)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{code.co_filename}:{code.co_name}')
+            frame = frame.f_back
+        if stack:
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def run(self, thread_id):
+        while not self.stopped.wait(self.interval):
+            self.sample(thread_id)
+
+    def __enter__(self):
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, args=(threading.get_ident(),), daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def dump(self, path):
+        with open(path, 'w') as output:
+            for stack, count in self.stacks.most_common():
+                output.write(f'{stack} {count}\n')
+
+
+class CallProfiler:
+    """Точный профиль всех вызовов через cProfile в формате pstats."""
+
+    extension = 'prof'
+
+    def __enter__(self):
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+
+    def dump(self, path):
+        self.profiler.dump_stats(path)
+
+
+profilers = {
+    'cprofile': CallProfiler,
+    'sample': StackSampler,
+}
+
+
+def profile_path(name):
+    return os.path.join(settings.PROFILER_DIR, name)
+
+
+def prune_profiles():
+    """
+    Оставляет только kept_profiles последних файлов профилей. Файлы
+    может одновременно удалять другой запрос, поэтому пропавшие
+    пропускаются.
+    """
+    profiles = []
+    for entry in os.scandir(settings.PROFILER_DIR):
+        if not profile_name_re.match(entry.name):
+            continue
+        try:
+            profiles.append((entry.stat().st_mtime, entry.path))
+        except FileNotFoundError:
+            continue
+    profiles.sort()
+    for _, path in profiles[:-kept_profiles]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class ProfilerMiddleware:
+    """
+    Профилирует один запрос сотрудника, если в нём есть параметр
+    ?_profile=cprofile|sample или заголовок X-Profile. Профиль view
+    вместе с рендером шаблона сохраняется в PROFILER_DIR, а ссылка на
+    скачивание отдаётся в заголовке X-Profile. При PROFILER_ENABLED =
+    False middleware отключается целиком.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.GET.get(profile_param) or request.META.get(
+            profile_header
+        )
+        if mode is None or not request.user.is_staff:
+            return self.get_response(request)
+        profiler = profilers.get(mode, CallProfiler)()
+        with profiler:
+            response = self.get_response(request)
+        name = f'{uuid.uuid4().hex}.{profiler.extension}'
+        os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+        profiler.dump(profile_path(name))
+        prune_profiles()
+        response['X-Profile'] = reverse('profile_download', args=[name])
+        return response
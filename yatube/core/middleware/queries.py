@@ -0,0 +1,186 @@
+import json
+import logging
+import os
+import re
+import time
+import traceback
+from collections import Counter
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger(__name__ + '.slow')
+fingerprint_re = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit):
+    """Объявляет, сколько SQL-запросов может сделать view за один запрос."""
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
+
+
+def fingerprint(sql):
+    """SQL без литералов и длины списков IN: одинаков для одного вызова ORM."""
+    for pattern, replacement in fingerprint_re:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def explain(sql, params):
+    """
+    План запроса; для всего, кроме SELECT, план не строится. Внутри
+    транзакции EXPLAIN идёт в точке сохранения: в PostgreSQL ошибка
+    прервала бы транзакцию самого запроса.
+    """
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return ''
+    prefix = (
+        'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    )
+    savepoint = (
+        transaction.atomic() if connection.in_atomic_block else nullcontext()
+    )
+    try:
+        with savepoint, connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return '\n'.join(
+                ' '.join(str(column) for column in row)
+                for row in cursor.fetchall()
+            )
+    except DatabaseError as error:
+        return f'EXPLAIN failed: {error}'
+
+
+def calling_code():
+    """Последняя строка кода проекта в стеке — обычно вызов ORM во view."""
+    own_files = (os.path.dirname(__file__),)
+    for frame in reversed(traceback.extract_stack()):
+        if (
+            frame.filename.startswith(settings.BASE_DIR)
+            and not frame.filename.startswith(own_files)
+        ):
+            path = os.path.relpath(frame.filename, settings.BASE_DIR)
+            return f'{path}:{frame.lineno} in {frame.name}'
+    return ''
+
+
+class QueryRecorder:
+    """
+    Считает запросы к БД через connection.execute_wrapper, поэтому
+    работает и без DEBUG. Запросы дольше SLOW_QUERY_THRESHOLD секунд
+    пишутся в журнал медленных запросов вместе с планом и местом вызова.
+    """
+
+    def __init__(self, request=None):
+        self.request = request
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            result = execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.duration += elapsed
+            self.count += 1
+            self.fingerprints[(sql, repr(params))] += 1
+        threshold = settings.SLOW_QUERY_THRESHOLD
+        if threshold is not None and elapsed >= threshold and not many:
+            self.log_slow(sql, params, elapsed)
+        return result
+
+    def log_slow(self, sql, params, elapsed):
+        match = getattr(self.request, 'resolver_match', None)
+        self.explaining = True
+        try:
+            plan = explain(sql, params)
+        finally:
+            self.explaining = False
+        slow_logger.warning(json.dumps({
+            'time': time.time(),
+            'view': match.view_name if match else '',
+            'source': calling_code(),
+            'duration_ms': round(elapsed * 1000, 2),
+            'sql': sql,
+            'params': (
+                [str(param) for param in params]
+                if isinstance(params, (list, tuple)) else str(params)
+            ),
+            'fingerprint': fingerprint(sql),
+            'plan': plan,
+        }, ensure_ascii=False))
+
+    def __enter__(self):
+        self.wrapper = connection.execute_wrapper(self)
+        self.wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self.wrapper.__exit__(*exc_info)
+
+    @property
+    def duplicates(self):
+        """SQL, выполненные больше одного раза с теми же параметрами."""
+        return sorted({
+            sql for (sql, params), times in self.fingerprints.items()
+            if times > 1
+        })
+
+
+class QueryBudgetMiddleware:
+    """
+    Замеряет число и время SQL-запросов каждого запроса, пишет превышения
+    бюджета view и повторы одинаковых запросов в лог, а при
+    QUERY_BUDGET_HEADERS отдаёт замеры в заголовках ответа. С
+    QUERY_BUDGET_STRICT нарушение бюджета поднимает исключение — так
+    регрессии ловятся тестами.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder(request) as recorder:
+            response = self.get_response(request)
+        request.query_stats = recorder
+        match = request.resolver_match
+        view_name = match.view_name if match else request.path
+        budget = getattr(match.func, 'query_budget', None) if match else None
+        problems = []
+        if budget is not None and recorder.count > budget:
+            problems.append(
+                f'{recorder.count} queries, budget {budget}'
+            )
+        if recorder.duplicates:
+            problems.append(
+                f'duplicate queries: {recorder.duplicates}'
+            )
+        if problems:
+            message = f'{view_name}: ' + '; '.join(problems)
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        if settings.QUERY_BUDGET_HEADERS:
+            response['X-Query-Count'] = recorder.count
+            response['X-Query-Time'] = f'{recorder.duration * 1000:.1f}ms'
+            response['X-Query-Duplicates'] = len(recorder.duplicates)
+        return response
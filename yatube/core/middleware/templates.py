@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+_state = threading.local()
+
+
+class RenderTimings:
+    """
+    Время рендера шаблонов и блоков за один запрос. total включает
+    вложенные шаблоны, self — только собственную работу секции, поэтому
+    сумма self равна общему времени рендера.
+    """
+
+    def __init__(self):
+        self.sections = defaultdict(
+            lambda: {'count': 0, 'total': 0.0, 'self': 0.0}
+        )
+        self.children = [0.0]
+
+    @contextmanager
+    def section(self, name):
+        self.children.append(0.0)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = self.children.pop()
+            self.children[-1] += elapsed
+            stats = self.sections[name]
+            stats['count'] += 1
+            stats['total'] += elapsed
+            stats['self'] += elapsed - nested
+
+
+def timed(name):
+    """Замер секции рендера; вне TemplateTimingMiddleware ничего не делает."""
+    timings = getattr(_state, 'timings', None)
+    if timings is None:
+        return nullcontext()
+    return timings.section(name)
+
+
+class TemplateTimingMiddleware:
+    """
+    Собирает время рендера по шаблонам, include и блокам {% cache %}
+    за запрос, отдаёт собственное время секций в метрики, пишет сводку
+    в лог на уровне DEBUG, а при TEMPLATE_TIMING_HEADERS добавляет
+    заголовок Server-Timing, который видно в инструментах браузера.
+    Шаблоны замеряет загрузчик core.loaders.Loader; без него в сводку
+    попадают только секции, размеченные timed().
+    """
+
+    def __init__(self, get_response):
+        if not settings.TEMPLATE_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = _state.timings = RenderTimings()
+        try:
+            response = self.get_response(request)
+        finally:
+            del _state.timings
+        if not timings.sections:
+            return response
+        ordered = sorted(
+            timings.sections.items(), key=lambda item: item[1]['self'],
+            reverse=True
+        )
+        for name, stats in ordered:
+            metrics.template_render_duration.observe(
+                stats['self'], template=name
+            )
+        logger.debug('%s %s', request.path, ', '.join(
+            f'{name} x{stats["count"]} {stats["self"] * 1000:.1f}ms'
+            for name, stats in ordered
+        ))
+        if settings.TEMPLATE_TIMING_HEADERS:
+            response['Server-Timing'] = ', '.join(
+                f'tpl{number};desc="{name}";dur={stats["self"] * 1000:.2f}'
+                for number, (name, stats) in enumerate(ordered)
+            )
+        return response
@@ -0,0 +1,46 @@
+import logging
+import time
+
+# Модуль импортируется в wsgi.py первым, до Django, поэтому остальные
+# импорты сделаны внутри функций.
+boot_started = time.perf_counter()
+logger = logging.getLogger(__name__)
+timings = {}
+
+
+def mark(phase):
+    """Запоминает, сколько прошло от начала загрузки до фазы запуска."""
+    from core import metrics
+
+    timings[phase] = time.perf_counter() - boot_started
+    metrics.startup_duration.observe(timings[phase], phase=phase)
+    logger.info('startup %s: %.0f ms', phase, timings[phase] * 1000)
+
+
+def preload():
+    """
+    Заранее делает то, что иначе досталось бы первому запросу: строит
+    URL-резолвер вместе с импортом всех view и компилирует частые
+    шаблоны. Шаблоны остаются в памяти только с кэширующим загрузчиком,
+    то есть при DEBUG = False.
+    """
+    from django.conf import settings
+    from django.template.loader import get_template
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+    for name in settings.STARTUP_PRELOAD_TEMPLATES:
+        get_template(name)
+
+
+def first_response(sender, **kwargs):
+    from django.core.signals import request_finished
+
+    request_finished.disconnect(dispatch_uid=__name__)
+    mark('first_response')
+
+
+def track_first_response():
+    from django.core.signals import request_finished
+
+    request_finished.connect(first_response, dispatch_uid=__name__)
@@ -0,0 +1,92 @@
+import uuid
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.shortcuts import render
+from django.template import Context
+from django.template.defaulttags import ForNode
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+
+def iter_for(node, context):
+    """
+    Рендерит {% for %} по одной итерации, как ForNode.render, но отдаёт
+    каждую итерацию отдельной строкой.
+    """
+    values = node.sequence.resolve(context, ignore_failures=True)
+    values = list(values) if values else []
+    if node.is_reversed:
+        values.reverse()
+    if not values:
+        yield node.nodelist_empty.render(context)
+        return
+    length = len(values)
+    parentloop = context.get('forloop', {})
+    for number, item in enumerate(values):
+        with context.push():
+            context['forloop'] = {
+                'parentloop': parentloop,
+                'counter0': number,
+                'counter': number + 1,
+                'revcounter': length - number,
+                'revcounter0': length - number - 1,
+                'first': number == 0,
+                'last': number == length - 1,
+            }
+            if len(node.loopvars) == 1:
+                context[node.loopvars[0]] = item
+            else:
+                context.update(dict(zip(node.loopvars, item)))
+            yield node.nodelist_loop.render(context)
+
+
+class TemplateStream:
+    """
+    Отложенная часть страницы. Тег {% stream %} вместо своего содержимого
+    выводит метку и запоминает контекст, а циклы внутри него рендерятся
+    по одной итерации уже во время отдачи ответа, после того как начало
+    страницы ушло клиенту.
+    """
+
+    def __init__(self):
+        self.marker = f'<!--stream-{uuid.uuid4().hex}-->'
+        self.nodelist = None
+
+    def defer(self, nodelist, context):
+        self.nodelist = nodelist
+        self.template = context.template
+        self.autoescape = context.autoescape
+        self.values = context.flatten()
+        return mark_safe(self.marker)
+
+    def render_deferred(self):
+        context = Context(self.values, autoescape=self.autoescape)
+        with context.bind_template(self.template):
+            for node in self.nodelist:
+                if isinstance(node, ForNode):
+                    yield from iter_for(node, context)
+                else:
+                    yield node.render_annotated(context)
+
+    def chunks(self, page):
+        head, _, tail = page.partition(self.marker)
+        yield head
+        if self.nodelist is not None:
+            yield from self.render_deferred()
+        yield tail
+
+
+def render_streaming(request, template_name, context):
+    """
+    Как render, но при STREAM_FEEDS отдаёт StreamingHttpResponse: шапка
+    страницы уходит сразу, содержимое {% stream %} — по мере рендера.
+    Каркас рендерится до возврата из view, поэтому CSRF-кука и заголовки
+    выставляются как обычно. Потоковые ответы не попадают в cache_page
+    и не дают тестовому клиенту response.context.
+    """
+    if not settings.STREAM_FEEDS:
+        return render(request, template_name, context)
+    stream = context['feed_stream'] = TemplateStream()
+    page = render_to_string(template_name, context, request)
+    return StreamingHttpResponse(stream.chunks(page))
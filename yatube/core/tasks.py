@@ -0,0 +1,171 @@
+import json
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+default_max_attempts: int = 5
+retry_base_delay: int = 10
+retry_max_delay: int = 60 * 60
+lease_timeout: int = 15 * 60
+
+
+def task(batch=False, max_attempts=default_max_attempts):
+    """
+    Помечает функцию как фоновую задачу. Обычная задача получает
+    аргументы из enqueue, пакетная — список словарей аргументов всех
+    однотипных задач, взятых обработчиком за один раз.
+    """
+    def decorator(func):
+        func.task_batch = batch
+        func.task_max_attempts = max_attempts
+        return func
+    return decorator
+
+
+def enqueue(name, **payload):
+    """
+    Ставит задачу в очередь. Строка задачи вида 'posts.tasks.func'
+    не требует импорта модуля задач там, где её ставят.
+    """
+    if settings.TASKS_EAGER:
+        func = import_string(name)
+        if func.task_batch:
+            func([payload])
+        else:
+            func(**payload)
+        return None
+    return Task.objects.create(
+        name=name,
+        payload=json.dumps(payload, cls=DjangoJSONEncoder)
+    )
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def release_stale():
+    """Возвращает в очередь задачи обработчиков, которые пропали."""
+    deadline = timezone.now() - timedelta(seconds=lease_timeout)
+    return Task.objects.filter(
+        status=Task.RUNNING, locked_at__lt=deadline
+    ).update(status=Task.PENDING, locked_by='')
+
+
+def claim(worker, limit):
+    """
+    Забирает до limit готовых задач. Там, где база умеет
+    SELECT ... FOR UPDATE SKIP LOCKED, строки блокируются; в SQLite
+    исключительность даёт условный UPDATE по статусу.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        candidates = Task.objects.filter(
+            status=Task.PENDING, run_at__lte=now
+        ).order_by('run_at')
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list('pk', flat=True)[:limit])
+        Task.objects.filter(pk__in=ids, status=Task.PENDING).update(
+            status=Task.RUNNING,
+            locked_by=worker,
+            locked_at=now,
+            attempts=F('attempts') + 1
+        )
+    return list(
+        Task.objects.filter(pk__in=ids, status=Task.RUNNING, locked_by=worker)
+        .order_by('name', 'run_at')
+    )
+
+
+def retry_delay(attempts):
+    return min(retry_base_delay * 2 ** (attempts - 1), retry_max_delay)
+
+
+def fail(tasks, max_attempts):
+    error = traceback.format_exc()
+    for item in tasks:
+        logger.warning('Task %s #%s failed', item.name, item.pk)
+        if item.attempts >= max_attempts:
+            item.status = Task.FAILED
+        else:
+            item.status = Task.PENDING
+            item.run_at = timezone.now() + timedelta(
+                seconds=retry_delay(item.attempts)
+            )
+        item.locked_by = ''
+        item.last_error = error
+        item.save(update_fields=[
+            'status', 'run_at', 'locked_by', 'last_error'
+        ])
+
+
+def execute(tasks):
+    """
+    Выполняет взятые задачи. Однотипные пакетные задачи уходят в функцию
+    одним вызовом; успешно выполненные задачи удаляются из таблицы.
+    """
+    for name, group in groupby(tasks, key=lambda item: item.name):
+        group = list(group)
+        try:
+            func = import_string(name)
+            batch = func.task_batch
+        except (ImportError, AttributeError):
+            # Нет функции или она не помечена @task: повторять бесполезно.
+            fail(group, 0)
+            continue
+        if batch:
+            runs = [group]
+        else:
+            runs = [[item] for item in group]
+        for run in runs:
+            payloads = [json.loads(item.payload) for item in run]
+            try:
+                if batch:
+                    func(payloads)
+                else:
+                    func(**payloads[0])
+            except Exception:
+                fail(run, func.task_max_attempts)
+            else:
+                Task.objects.filter(pk__in=[item.pk for item in run]).delete()
+
+
+def work(limit, stop_event=None, poll_interval=1.0, once=False):
+    """
+    Цикл одного потока обработчика. С once=True разбирает очередь
+    до опустошения и возвращается, иначе работает до stop_event.
+    Ошибки базы (например, занятая SQLite) не останавливают поток:
+    он ждёт poll_interval и пробует снова, а взятые задачи вернёт
+    release_stale по истечении аренды.
+    """
+    if stop_event is None:
+        stop_event = threading.Event()
+    worker = worker_name()
+    while not stop_event.is_set():
+        try:
+            tasks = claim(worker, limit)
+            execute(tasks)
+        except DatabaseError:
+            logger.exception('Task worker %s database error', worker)
+            tasks = []
+        if tasks:
+            continue
+        if once:
+            break
+        stop_event.wait(poll_interval)
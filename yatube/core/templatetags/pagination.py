@@ -0,0 +1,33 @@
+from django import template
+
+register = template.Library()
+
+pages_on_each_side: int = 2
+pages_on_ends: int = 1
+
+
+@register.simple_tag
+def page_window(page, on_each_side=pages_on_each_side,
+                on_ends=pages_on_ends):
+    """
+    Номера страниц для навигации: первые и последние on_ends страниц
+    и on_each_side страниц вокруг текущей, пропуски обозначены None.
+    Длина списка не зависит от числа страниц.
+    """
+    number = page.number
+    last = page.paginator.num_pages
+    if last <= (on_each_side + on_ends) * 2 + 1:
+        return list(range(1, last + 1))
+    head = []
+    start = number - on_each_side
+    if start > on_ends + 2:
+        head = list(range(1, on_ends + 1)) + [None]
+    else:
+        start = 1
+    tail = []
+    end = number + on_each_side
+    if end < last - on_ends - 1:
+        tail = [None] + list(range(last - on_ends + 1, last + 1))
+    else:
+        end = last
+    return head + list(range(start, end + 1)) + tail
@@ -0,0 +1,26 @@
+from django import template
+
+register = template.Library()
+
+
+class StreamNode(template.Node):
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render(self, context):
+        stream = context.get('feed_stream')
+        if stream is None:
+            return self.nodelist.render(context)
+        return stream.defer(self.nodelist, context)
+
+
+@register.tag
+def stream(parser, token):
+    """
+    {% stream %}...{% endstream %}: при потоковом рендере содержимое
+    откладывается и отдаётся после шапки страницы, иначе рендерится
+    на месте.
+    """
+    nodelist = parser.parse(('endstream',))
+    parser.delete_first_token()
+    return StreamNode(nodelist)
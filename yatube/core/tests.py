@@ -0,0 +1,581 @@
+import copy
+import gc
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.db import OperationalError, connection
+from django.template import Template
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import metrics, startup
+from core.middleware import compression
+from core.middleware import profiling
+from core.middleware.profiling import StackSampler
+from core.middleware.queries import explain, fingerprint
+from core.models import Task
+from core.templatetags.pagination import page_window
+from core.tasks import enqueue, task, work
+from posts.models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_PROFILER_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+file_content = bytes(range(100))
+batch_calls = []
+
+
+@task(batch=True)
+def collect_batch(payloads):
+    batch_calls.append(payloads)
+
+
+def plain_function():
+    pass
+
+
+@task(max_attempts=2)
+def broken_task():
+    raise RuntimeError('Тестовая ошибка')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ServeMediaTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Создание файла в MEDIA_ROOT для тестов отдачи медиа."""
+        super().setUpClass()
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'), exist_ok=True)
+        with open(os.path.join(TEMP_MEDIA_ROOT, 'posts', 'a.bin'), 'wb') as f:
+            f.write(file_content)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.url = '/media/posts/a.bin'
+
+    def test_full_response_has_validators(self):
+        """Файл отдаётся целиком с ETag и Accept-Ranges."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), file_content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+
+    def test_range_request(self):
+        """Запрос с Range получает только нужный кусок файла."""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, HTTPStatus.PARTIAL_CONTENT)
+        self.assertEqual(
+            b''.join(response.streaming_content), file_content[10:20]
+        )
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(response['Content-Length'], '10')
+
+    def test_range_response_hides_file_descriptor(self):
+        """Кусок файла не отдаётся серверу для sendfile до конца файла."""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertFalse(hasattr(response.file_to_stream, 'fileno'))
+        response.close()
+
+    def test_suffix_and_unsatisfiable_ranges(self):
+        """Диапазон с конца файла отдаётся, диапазон за концом — 416."""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(
+            b''.join(response.streaming_content), file_content[-5:]
+        )
+        response = self.client.get(self.url, HTTP_RANGE='bytes=200-')
+        self.assertEqual(
+            response.status_code, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+
+    def test_if_none_match_returns_not_modified(self):
+        """Совпавший ETag даёт 304 без тела."""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_missing_file_and_traversal(self):
+        """Несуществующий файл и выход за MEDIA_ROOT дают 404."""
+        for url in ('/media/posts/missing.bin', '/media/../settings.py'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_accel_redirect(self):
+        """С префиксом X-Accel-Redirect отдача передаётся nginx."""
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/a.bin'
+        )
+        self.assertEqual(response.content, b'')
+
+
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        batch_calls.clear()
+
+    def test_batch_tasks_run_in_one_call(self):
+        """Однотипные пакетные задачи выполняются одним вызовом."""
+        for number in range(3):
+            enqueue('core.tests.collect_batch', number=number)
+        work(limit=10, once=True)
+        self.assertEqual(len(batch_calls), 1)
+        self.assertEqual(
+            sorted(payload['number'] for payload in batch_calls[0]),
+            [0, 1, 2]
+        )
+        self.assertFalse(Task.objects.exists())
+
+    def test_failed_task_is_retried_later(self):
+        """Упавшая задача возвращается в очередь с задержкой."""
+        enqueue('core.tests.broken_task')
+        work(limit=10, once=True)
+        failed = Task.objects.get()
+        self.assertEqual(failed.status, Task.PENDING)
+        self.assertEqual(failed.attempts, 1)
+        self.assertGreater(failed.run_at, timezone.now())
+        self.assertIn('Тестовая ошибка', failed.last_error)
+
+    def test_task_fails_after_max_attempts(self):
+        """После исчерпания попыток задача помечается как ошибочная."""
+        enqueue('core.tests.broken_task')
+        for _ in range(2):
+            Task.objects.update(run_at=timezone.now())
+            work(limit=10, once=True)
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+
+    def test_function_without_task_decorator_fails(self):
+        """Функция без @task помечается ошибочной, поток не падает."""
+        enqueue('core.tests.plain_function')
+        work(limit=10, once=True)
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+
+    def test_database_error_does_not_stop_worker(self):
+        """Занятая база не роняет поток обработчика."""
+        with mock.patch(
+            'core.tasks.claim',
+            side_effect=OperationalError('database is locked')
+        ):
+            with self.assertLogs('core.tasks', 'ERROR'):
+                work(limit=10, once=True)
+
+
+@override_settings(PROFILER_DIR=TEMP_PROFILER_DIR)
+class ProfilerMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.user = User.objects.create_user(username='reader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_PROFILER_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def test_staff_request_is_profiled(self):
+        """Профиль запроса сотрудника сохраняется и скачивается."""
+        modes = (('cprofile', '.prof'), ('sample', '.collapsed'))
+        for mode, extension in modes:
+            with self.subTest(mode=mode):
+                response = self.staff_client.get(
+                    '/about/author/', {'_profile': mode}
+                )
+                url = response['X-Profile']
+                self.assertTrue(url.endswith(extension))
+                download = self.staff_client.get(url)
+                self.assertEqual(download.status_code, HTTPStatus.OK)
+
+    def test_sampler_collects_collapsed_stacks(self):
+        """Сэмплер записывает стеки работающего потока."""
+        with StackSampler(interval=0.001) as sampler:
+            deadline = time.monotonic() + 0.05
+            while time.monotonic() < deadline:
+                pass
+        self.assertIn(
+            'test_sampler_collects_collapsed_stacks', ''.join(sampler.stacks)
+        )
+
+    def test_prune_ignores_files_removed_concurrently(self):
+        """Профили, удалённые другим запросом, не роняют очистку."""
+        os.makedirs(TEMP_PROFILER_DIR, exist_ok=True)
+        for number in range(3):
+            name = f'{number:032x}.prof'
+            with open(os.path.join(TEMP_PROFILER_DIR, name), 'wb'):
+                pass
+        remove = mock.Mock(side_effect=FileNotFoundError)
+        with mock.patch.object(profiling, 'kept_profiles', 1):
+            with mock.patch.object(profiling.os, 'remove', remove):
+                profiling.prune_profiles()
+        self.assertEqual(remove.call_count, 2)
+
+    def test_regular_requests_are_not_profiled(self):
+        """Без флага и для обычных пользователей профиль не снимается."""
+        client = Client()
+        client.force_login(self.user)
+        for client, params in (
+            (self.staff_client, {}),
+            (client, {'_profile': 'cprofile'}),
+        ):
+            with self.subTest(params=params):
+                response = client.get('/about/author/', params)
+                self.assertFalse(response.has_header('X-Profile'))
+        response = client.get('/profiles/' + '0' * 32 + '.prof')
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+@override_settings(METRICS_TOKEN='metrics-token')
+class MetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.metrics_client = Client(HTTP_AUTHORIZATION='Bearer metrics-token')
+
+    def test_metrics_count_views_and_page_cache(self):
+        """Выгрузка содержит запросы по view и попадания в кэш страниц."""
+        for _ in range(2):
+            self.client.get('/')
+        response = self.metrics_client.get('/metrics')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        text = response.content.decode()
+        for sample in (
+            'yatube_http_requests_total{view="posts:index",method="GET",'
+            'status="200"}',
+            'yatube_http_request_duration_seconds_bucket{view="posts:index",'
+            'le="+Inf"}',
+            'yatube_db_queries_total{view="posts:index"}',
+            'yatube_cache_requests_total{kind="page",name="index_page",'
+            'result="hit"}',
+            'yatube_cache_requests_total{kind="page",name="index_page",'
+            'result="miss"}',
+        ):
+            with self.subTest(sample=sample):
+                self.assertIn(sample, text)
+
+    def test_metrics_merge_worker_files(self):
+        """Значения других процессов из METRICS_DIR складываются."""
+        metrics_dir = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, metrics_dir, ignore_errors=True)
+        sample = ['yatube_upload_size_bytes_count', [], 1000]
+        name = f'{os.getpid()}-0.json'
+        with open(os.path.join(metrics_dir, name), 'w') as output:
+            json.dump([sample], output)
+        with override_settings(METRICS_DIR=metrics_dir):
+            own = metrics.store.snapshot()[sample[0], ()]
+            text = self.metrics_client.get('/metrics').content.decode()
+        total = metrics.format_value(own + 1000)
+        self.assertIn(f'yatube_upload_size_bytes_count {total}', text)
+
+    def test_dead_process_files_are_retained(self):
+        """Файлы умерших воркеров вливаются в общий итог и удаляются."""
+        metrics_dir = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, metrics_dir, ignore_errors=True)
+        finished = subprocess.Popen([sys.executable, '-c', 'pass'])
+        finished.wait()
+        sample = ['yatube_upload_size_bytes_count', [], 1000]
+        for name in (f'{finished.pid}-ab.json', f'{finished.pid}-cd.json'):
+            with open(os.path.join(metrics_dir, name), 'w') as output:
+                json.dump([sample], output)
+        with override_settings(METRICS_DIR=metrics_dir):
+            own = metrics.store.snapshot()[sample[0], ()]
+            total = metrics.format_value(own + 2000)
+            for _ in range(2):
+                text = self.metrics_client.get('/metrics').content.decode()
+                self.assertIn(f'yatube_upload_size_bytes_count {total}', text)
+        self.assertEqual(sorted(
+            name for name in os.listdir(metrics_dir)
+            if name.endswith('.json')
+        ), sorted([
+            os.path.basename(metrics.store.path()), metrics.retained_file
+        ]))
+
+    def test_metrics_require_token(self):
+        """Без токена или с чужим токеном метрики не отдаются."""
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'}):
+            with self.subTest(headers=headers):
+                response = self.client.get('/metrics', **headers)
+                self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        with override_settings(METRICS_TOKEN=''):
+            response = self.client.get(
+                '/metrics', HTTP_AUTHORIZATION='Bearer '
+            )
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    def test_finished_threads_are_merged(self):
+        """Значения завершившихся потоков не теряются и не копятся."""
+        store = metrics.Store()
+        threads = []
+        for _ in range(5):
+            thread = threading.Thread(target=store.add, args=('key', 1))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        del threads, thread
+        gc.collect()
+        self.assertEqual(store.threads, {})
+        self.assertEqual(store.snapshot()['key'], 5)
+
+
+class SlowQueryLogTest(TestCase):
+    def test_slow_queries_logged_with_plan_and_source(self):
+        """Медленный запрос пишется в журнал с view, местом вызова и планом."""
+        cache.clear()
+        with override_settings(SLOW_QUERY_THRESHOLD=0), self.assertLogs(
+            'core.middleware.queries.slow'
+        ) as logs:
+            self.client.get('/')
+        entries = [json.loads(record.getMessage()) for record in logs.records]
+        posts_query = next(
+            entry for entry in entries if 'posts_post' in entry['sql']
+        )
+        self.assertEqual(posts_query['view'], 'posts:index')
+        self.assertTrue(posts_query['source'].startswith('posts/views.py'))
+        self.assertTrue(posts_query['plan'])
+
+    def test_failed_explain_keeps_transaction_usable(self):
+        """Ошибка EXPLAIN в транзакции откатывается до точки сохранения."""
+        with CaptureQueriesContext(connection) as queries:
+            plan = explain('SELECT * FROM missing_table', [])
+        self.assertTrue(plan.startswith('EXPLAIN failed'))
+        self.assertTrue(any(
+            query['sql'].startswith('SAVEPOINT') for query in queries
+        ))
+        self.assertFalse(connection.needs_rollback)
+        self.assertFalse(Post.objects.exists())
+
+    def test_fingerprint_ignores_literals_and_list_length(self):
+        """Отпечаток не зависит от значений и длины списка IN."""
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s) AND x = 5'),
+            fingerprint("SELECT * FROM t WHERE id IN (%s)  AND x = 'a'")
+        )
+
+    def test_slow_queries_report_groups_by_fingerprint(self):
+        """Отчёт складывает записи с одинаковым отпечатком."""
+        log_dir = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, log_dir, ignore_errors=True)
+        log_path = os.path.join(log_dir, 'slow.log')
+        with open(log_path, 'w') as log:
+            for duration in (150, 250):
+                log.write(json.dumps({
+                    'view': 'posts:index',
+                    'source': 'posts/views.py:30 in index',
+                    'duration_ms': duration,
+                    'sql': 'SELECT 1',
+                    'fingerprint': 'SELECT ?',
+                    'plan': 'SCAN posts_post',
+                }) + '\n')
+        out = StringIO()
+        call_command('slow_queries', log=log_path, stdout=out)
+        report = out.getvalue()
+        self.assertIn('2 раз, всего 400 мс', report)
+        self.assertIn('posts/views.py:30 in index (2)', report)
+        self.assertIn('SCAN posts_post', report)
+
+
+def timed_templates():
+    """Настройка TEMPLATES с загрузчиком, замеряющим рендер."""
+    templates = copy.deepcopy(settings.TEMPLATES)
+    templates[0]['APP_DIRS'] = False
+    templates[0]['OPTIONS']['loaders'] = [('core.loaders.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ])]
+    return templates
+
+
+class TemplateTimingTest(TestCase):
+    @override_settings(
+        TEMPLATE_TIMING=True, TEMPLATE_TIMING_HEADERS=True,
+        TEMPLATES=timed_templates()
+    )
+    def test_render_time_reported_per_template(self):
+        """Server-Timing и метрики содержат шаблоны, include и кэш."""
+        cache.clear()
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Тестовый пост')
+        response = self.client.get('/')
+        server_timing = response['Server-Timing']
+        for section in (
+            'posts/index.html', 'base.html', 'includes/header.html',
+            'includes/paginator.html', 'cache:index_page', 'post_card',
+        ):
+            with self.subTest(section=section):
+                self.assertIn(f'desc="{section}"', server_timing)
+        self.assertIn(
+            'yatube_template_render_seconds_count'
+            '{template="includes/header.html"}',
+            metrics.render()
+        )
+
+    def test_timing_is_off_by_default(self):
+        """Без TEMPLATE_TIMING шаблоны Django не подменяются."""
+        response = self.client.get('/about/author/')
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertIs(type(response.templates[0]), Template)
+
+
+class MemoryProfilerTest(TestCase):
+    @override_settings(MEMORY_PROFILING=True, MEMORY_BUDGET=1)
+    def test_request_over_budget_is_logged(self):
+        """Запрос сверх бюджета памяти попадает в лог с местами выделений."""
+        self.addCleanup(tracemalloc.stop)
+        cache.clear()
+        with self.assertLogs('core.middleware.memory') as logs:
+            response = self.client.get('/')
+        stats = response.wsgi_request.memory_stats
+        self.assertGreater(stats.peak, 0)
+        self.assertTrue(stats.top)
+        self.assertIn('posts:index: peak', logs.output[0])
+
+
+class StartupTest(TestCase):
+    def test_pillow_is_not_imported_at_startup(self):
+        """Загрузка воркера с предзагрузкой не импортирует Pillow."""
+        result = subprocess.run(
+            [sys.executable, '-c', (
+                'import sys, django\n'
+                'django.setup()\n'
+                'from core.startup import preload\n'
+                'preload()\n'
+                'print("PIL" in sys.modules)'
+            )],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE='yatube.settings')
+        )
+        self.assertEqual(result.stdout.strip(), 'False', result.stderr)
+
+    def test_first_response_time_is_recorded_once(self):
+        """Время до первого ответа записывается только один раз."""
+        startup.timings.pop('first_response', None)
+        startup.track_first_response()
+        self.client.get('/about/author/')
+        first = startup.timings['first_response']
+        self.client.get('/about/author/')
+        self.assertEqual(startup.timings['first_response'], first)
+
+    def test_import_profile_reports_phases_and_modules(self):
+        """Команда import_profile показывает фазы запуска и модули."""
+        out = StringIO()
+        call_command('import_profile', limit=5, stdout=out)
+        report = out.getvalue()
+        self.assertIn('django.setup()', report)
+        self.assertIn('preload()', report)
+
+
+class PageWindowTest(TestCase):
+    def test_window_around_current_page(self):
+        """В навигации края, окно вокруг текущей страницы и пропуски."""
+        paginator = Paginator(range(1000), 10)
+        for number, expected in (
+            (1, [1, 2, 3, None, 100]),
+            (4, [1, 2, 3, 4, 5, 6, None, 100]),
+            (50, [1, None, 48, 49, 50, 51, 52, None, 100]),
+            (100, [1, None, 98, 99, 100]),
+        ):
+            with self.subTest(number=number):
+                self.assertEqual(
+                    page_window(paginator.page(number)), expected
+                )
+        self.assertEqual(
+            page_window(Paginator(range(60), 10).page(3)),
+            [1, 2, 3, 4, 5, 6]
+        )
+
+    def test_feed_renders_only_window_links(self):
+        """Лента с сотней страниц выводит ограниченное число ссылок."""
+        author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {number}')
+            for number in range(1000)
+        )
+        response = self.client.get(f'/profile/{author.username}/?page=50')
+        content = response.content.decode()
+        self.assertLess(content.count('class="page-item'), 15)
+        self.assertIn('href="?page=100"', content)
+
+
+class CompressionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_encoding_follows_accept_encoding(self):
+        """Кодировка выбирается по Accept-Encoding с учётом q=0."""
+        with mock.patch.object(compression, 'brotli', None):
+            for header, encoding in (
+                ('gzip, deflate', 'gzip'),
+                ('gzip;q=0.5', 'gzip'),
+                ('*', 'gzip'),
+                ('gzip;q=0, *', None),
+                ('identity', None),
+                ('', None),
+            ):
+                with self.subTest(header=header):
+                    self.assertEqual(
+                        compression.choose_encoding(header), encoding
+                    )
+
+    def test_cached_page_is_not_recompressed(self):
+        """Страница из кэша отдаётся готовыми сжатыми байтами."""
+        plain = self.client.get('/')
+        cache.clear()
+        self.client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+        with mock.patch.object(
+            compression, 'gzip_compress', wraps=compression.gzip_compress
+        ) as gzip_compress:
+            response = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+        gzip_compress.assert_not_called()
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(
+            int(response['Content-Length']), len(response.content)
+        )
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_streamed_feed_is_compressed(self):
+        """Потоковая лента сжимается по частям."""
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Пост')
+        url = f'/profile/{author.username}/'
+        plain = self.client.get(url)
+        with self.settings(STREAM_FEEDS=True):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)),
+            plain.content
+        )
+
+    def test_small_responses_are_not_compressed(self):
+        """Маленькие ответы уходят без сжатия."""
+        response = self.client.get(
+            '/api/posts/?fields=id', HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertFalse(response.has_header('Content-Encoding'))
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+from django.core.files.uploadhandler import FileUploadHandler
+
+from core import metrics
+
+
+class MaxSizeUploadHandler(FileUploadHandler):
+    """
+    Обрывает загрузку, как только файл превышает FILE_UPLOAD_MAX_SIZE.
+    Должен стоять первым в FILE_UPLOAD_HANDLERS, чтобы лишние байты
+    не успели попасть ни в память, ни во временный файл.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        max_body_size = (
+            settings.FILE_UPLOAD_MAX_SIZE
+            + settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        )
+        if content_length > max_body_size:
+            raise RequestDataTooBig(
+                'Request body exceeded settings.FILE_UPLOAD_MAX_SIZE.'
+            )
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.FILE_UPLOAD_MAX_SIZE:
+            raise RequestDataTooBig(
+                'Uploaded file exceeded settings.FILE_UPLOAD_MAX_SIZE.'
+            )
+        return raw_data
+
+    def file_complete(self, file_size):
+        metrics.upload_size.observe(file_size)
+        return None
@@ -1,4 +1,16 @@
+import os
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import PermissionDenied, SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+from django.utils._os import safe_join
+
+from . import metrics
+from .media import accel_redirect, serve_file
+from .middleware.profiling import profile_name_re, profile_path
 
 
 def page_not_found(request, exception):
@@ -15,3 +27,44 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Файл не найден')
+    if settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+        return accel_redirect(path)
+    if not os.path.isfile(full_path):
+        raise Http404('Файл не найден')
+    return serve_file(request, full_path)
+
+
+@staff_member_required
+def profile_download(request, name):
+    """Отдаёт профиль, снятый ProfilerMiddleware."""
+    if not profile_name_re.match(name):
+        raise Http404('Профиль не найден')
+    path = profile_path(name)
+    if not os.path.isfile(path):
+        raise Http404('Профиль не найден')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+
+
+def export_metrics(request):
+    """
+    Метрики всех процессов в формате Prometheus. Доступ — по токену
+    в заголовке Authorization: за nginx адрес клиента всегда 127.0.0.1,
+    поэтому проверка REMOTE_ADDR ничего не защищает.
+    """
+    expected = f'Bearer {settings.METRICS_TOKEN}'
+    given = request.META.get('HTTP_AUTHORIZATION', '')
+    if not settings.METRICS_TOKEN or not constant_time_compare(
+        given, expected
+    ):
+        raise PermissionDenied
+    return HttpResponse(
+        metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,198 @@
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from core.middleware.queries import query_budget
+
+from .feeds import (
+    after_cursor, encode_cursor, feed_version, new_posts_count,
+    version_poll_interval, wait_for_feed_version
+)
+from .models import Comment, Follow, Group, Post, User
+
+default_limit: int = 10
+max_limit: int = 100
+max_wait: float = 60.0
+# Имя поля в ответе -> путь для .values(); тянутся только нужные колонки.
+post_fields: dict = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+}
+default_fields: tuple = tuple(post_fields)
+comment_fields: tuple = ('author__username', 'text', 'pub_date')
+
+# Кодировщик создаётся один раз, без отступов и экранирования кириллицы.
+encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def json_response(payload, status=200):
+    return HttpResponse(
+        encoder.encode(payload),
+        content_type='application/json; charset=utf-8',
+        status=status
+    )
+
+
+def api_view(view_func):
+    """Превращает ApiError в JSON-ответ с кодом ошибки."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return json_response(view_func(request, *args, **kwargs))
+        except ApiError as error:
+            return json_response({'error': str(error)}, status=error.status)
+    return wrapper
+
+
+def selected_fields(request):
+    names = request.GET.get('fields')
+    if not names:
+        return default_fields
+    names = tuple(name.strip() for name in names.split(','))
+    unknown = [name for name in names if name not in post_fields]
+    if unknown:
+        raise ApiError(400, f'Неизвестные поля: {", ".join(unknown)}')
+    return names
+
+
+def serialize(row, fields):
+    """Строка .values() в словарь ответа: даты в ISO, картинки в URL."""
+    item = {}
+    for name in fields:
+        value = row[post_fields[name]]
+        if name == 'pub_date':
+            value = value.isoformat()
+        elif name == 'image':
+            value = settings.MEDIA_URL + value if value else None
+        item[name] = value
+    return item
+
+
+def feed_page(request, posts):
+    """Страница ленты по курсору — последней паре (pub_date, id)."""
+    fields = selected_fields(request)
+    try:
+        limit = min(int(request.GET.get('limit', default_limit)), max_limit)
+    except ValueError:
+        raise ApiError(400, 'Неверный limit')
+    if limit < 1:
+        raise ApiError(400, 'Неверный limit')
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            posts = after_cursor(posts, cursor)
+        except ValueError:
+            raise ApiError(400, 'Неверный курсор')
+    columns = {post_fields[name] for name in fields} | {'id', 'pub_date'}
+    rows = list(
+        posts.order_by('-pub_date', '-id').values(*columns)[:limit + 1]
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(
+            rows[limit - 1]['pub_date'], rows[limit - 1]['id']
+        )
+    return {
+        'results': [serialize(row, fields) for row in rows[:limit]],
+        'next': next_cursor,
+    }
+
+
+@api_view
+@query_budget(1)
+def index(request):
+    return feed_page(request, Post.objects.all())
+
+
+@api_view
+@query_budget(2)
+def group_posts(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'id', flat=True
+    ).first()
+    if group_id is None:
+        raise ApiError(404, 'Группа не найдена')
+    return feed_page(request, Post.objects.filter(group_id=group_id))
+
+
+@api_view
+@query_budget(2)
+def profile(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'id', flat=True
+    ).first()
+    if author_id is None:
+        raise ApiError(404, 'Пользователь не найден')
+    return feed_page(request, Post.objects.filter(author_id=author_id))
+
+
+@api_view
+@query_budget(3)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Нужна авторизация')
+    authors = Follow.objects.filter(user=request.user).values('author_id')
+    return feed_page(request, Post.objects.filter(author_id__in=authors))
+
+
+@api_view
+@query_budget(2)
+def post_detail(request, post_id):
+    fields = selected_fields(request)
+    columns = {post_fields[name] for name in fields}
+    row = Post.objects.filter(id=post_id).values(*columns).first()
+    if row is None:
+        raise ApiError(404, 'Пост не найден')
+    item = serialize(row, fields)
+    item['comments'] = [
+        {
+            'author': comment['author__username'],
+            'text': comment['text'],
+            'pub_date': comment['pub_date'].isoformat(),
+        }
+        for comment in Comment.objects.filter(post_id=post_id).order_by(
+            'pub_date'
+        ).values(*comment_fields)
+    ]
+    return item
+
+
+@api_view
+@query_budget(int(max_wait / version_poll_interval) + 2)
+def version(request):
+    """
+    Версия ленты (id последнего поста) и число новых постов с версии
+    since. Версия берётся из кэша процесса, а новые посты считаются
+    запросом только при их появлении. С ?wait=<секунды> запрос ждёт
+    новой версии до таймаута (long polling), перечитывая версию раз
+    в version_poll_interval; ждущий запрос занимает поток воркера.
+    new равно null без since и после удаления последних постов, тогда
+    ленту стоит обновить.
+    """
+    try:
+        since = int(request.GET.get('since', -1))
+        wait = min(float(request.GET.get('wait', 0)), max_wait)
+    except ValueError:
+        raise ApiError(400, 'Неверные since или wait')
+    if wait > 0 and since >= 0:
+        current = wait_for_feed_version(since, wait)
+    else:
+        current = feed_version()
+    new = None
+    if since == current:
+        new = 0
+    elif 0 <= since < current:
+        new = new_posts_count(since, current)
+    return {'version': current, 'new': new}
@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from .follow_graph import follow_deleted, follow_saved
+        follow = self.get_model('Follow')
+        post_save.connect(follow_saved, sender=follow)
+        post_delete.connect(follow_deleted, sender=follow)
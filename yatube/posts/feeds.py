@@ -0,0 +1,150 @@
+import base64
+import threading
+import time
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db.models import Max, Q
+from django.http import HttpResponse, HttpResponseBadRequest
+
+from core.fragments import render_block
+
+fragment_block: str = 'posts'
+version_key: str = 'feed.version'
+version_poll_interval: float = 1.0
+
+version_changed = threading.Condition()
+
+
+def encode_cursor(pub_date, pk):
+    value = f'{pub_date.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Пара (pub_date, id) из курсора; для мусора — ValueError."""
+    value = base64.urlsafe_b64decode(cursor.encode()).decode()
+    pub_date, pk = value.split('|')
+    return datetime.fromisoformat(pub_date), int(pk)
+
+
+def after_cursor(posts, cursor):
+    """
+    Посты, идущие в ленте после курсора. Лента упорядочена по
+    (pub_date, id), поэтому стоимость запроса не зависит от того,
+    насколько далеко пролистана лента, в отличие от OFFSET.
+    """
+    pub_date, pk = decode_cursor(cursor)
+    return posts.filter(
+        Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk)
+    )
+
+
+class CursorPage(list):
+    """
+    Посты одной порции ленты. Строковое представление — позиция порции:
+    по нему {% cache %} в шаблоне различает порции, как по странице.
+    """
+
+    def __init__(self, posts, position, next_cursor):
+        super().__init__(posts)
+        self.position = position
+        self.next_cursor = next_cursor
+
+    def __str__(self):
+        return f'<CursorPage {self.position}>'
+
+
+def cursor_page(request, posts, size):
+    """
+    Порция ленты после ?cursor= или, для продолжения обычной страницы,
+    начиная со страницы ?page=. Количество постов не считается:
+    достаточно взять на один пост больше порции.
+    """
+    posts = posts.order_by('-pub_date', '-id')
+    cursor = request.GET.get('cursor')
+    if cursor:
+        posts = after_cursor(posts, cursor)
+        position = cursor
+    else:
+        try:
+            number = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            number = 1
+        offset = (number - 1) * size
+        posts = posts[offset:]
+        position = f'page-{number}'
+    posts = list(posts[:size + 1])
+    next_cursor = None
+    if len(posts) > size:
+        posts = posts[:size]
+        next_cursor = encode_cursor(posts[-1].pub_date, posts[-1].pk)
+    return CursorPage(posts, position, next_cursor)
+
+
+def render_fragment(request, template_name, posts, context, size):
+    """
+    Только карточки постов ленты — блок posts шаблона страницы, без
+    base.html, шапки и подвала — для подгрузки при прокрутке. Курсор
+    следующей порции приходит в заголовке X-Next-Cursor.
+    """
+    try:
+        page = cursor_page(request, posts, size)
+    except ValueError:
+        return HttpResponseBadRequest('Неверный курсор')
+    context['page_obj'] = page
+    response = HttpResponse(
+        render_block(request, template_name, fragment_block, context)
+    )
+    if page.next_cursor:
+        response['X-Next-Cursor'] = page.next_cursor
+    return response
+
+
+def feed_version():
+    """
+    Версия ленты — id последнего поста. Её даёт база, поэтому она общая
+    для всех процессов. Чтобы опрос не ходил в базу на каждый запрос,
+    значение держится в кэше процесса version_poll_interval секунд;
+    новый пост этого процесса сбрасывает его сразу.
+    """
+    version = cache.get(version_key)
+    if version is None:
+        from .models import Post
+        version = Post.objects.aggregate(last=Max('id'))['last'] or 0
+        cache.set(version_key, version, timeout=version_poll_interval)
+    return version
+
+
+def new_posts_count(since, version):
+    """Число постов, появившихся между версиями since и version."""
+    from .models import Post
+    return Post.objects.filter(id__gt=since, id__lte=version).count()
+
+
+def bump_feed_version():
+    """
+    Сбрасывает версию ленты в кэше процесса и будит ждущие её запросы.
+    Вызывается после commit, чтобы разбуженный клиент уже видел пост.
+    """
+    cache.delete(version_key)
+    with version_changed:
+        version_changed.notify_all()
+
+
+def wait_for_feed_version(since, timeout):
+    """
+    Ждёт, пока версия ленты станет больше since, но не дольше timeout
+    секунд. Посты этого процесса будят ожидание сразу, посты других
+    процессов видны не позже чем через version_poll_interval.
+    """
+    deadline = time.monotonic() + timeout
+    version = feed_version()
+    while version <= since:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        with version_changed:
+            version_changed.wait(min(remaining, version_poll_interval))
+        version = feed_version()
+    return version
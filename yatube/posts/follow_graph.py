@@ -0,0 +1,238 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+from functools import partial
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Follow, FollowChange
+
+id_typecode: str = 'l'
+empty = array(id_typecode)
+# Как часто граф сверяется с журналом изменений, в секундах.
+sync_interval: float = 1.0
+# Сколько последних id журнала перечитывается при сверке: в PostgreSQL
+# транзакция с меньшим id может закоммититься позже соседней.
+replay_overlap: int = 50
+# Больше изменений за раз дешевле загрузить граф заново.
+max_replay: int = 10000
+change_retention: int = 24 * 60 * 60
+prune_every: int = 1000
+
+_graph = None
+_lock = threading.Lock()
+
+
+def contains(ids, value):
+    index = bisect_left(ids, value)
+    return index < len(ids) and ids[index] == value
+
+
+class FollowGraph:
+    """
+    Граф подписок в памяти процесса: для каждого пользователя —
+    отсортированные массивы id авторов, на которых он подписан, и id его
+    подписчиков. Проверка подписки — двоичный поиск, число подписок —
+    длина массива, без обращения к базе.
+    """
+
+    def __init__(self, edges, version, applied=()):
+        following = defaultdict(list)
+        followers = defaultdict(list)
+        for user_id, author_id in edges:
+            following[user_id].append(author_id)
+            followers[author_id].append(user_id)
+        self.following = {
+            user_id: array(id_typecode, sorted(ids))
+            for user_id, ids in following.items()
+        }
+        self.followers = {
+            author_id: array(id_typecode, sorted(ids))
+            for author_id, ids in followers.items()
+        }
+        self.version = version
+        self.applied = set(applied)
+        self.synced_at = time.monotonic()
+        self.next_sync = self.synced_at + sync_interval
+
+    @classmethod
+    def load(cls):
+        """
+        Граф из базы. Журнал читается раньше подписок: изменения,
+        успевшие попасть в граф, при сверке применятся повторно, а это
+        безопасно.
+        """
+        applied = list(FollowChange.objects.order_by('-id').values_list(
+            'id', flat=True
+        )[:replay_overlap])
+        return cls(
+            Follow.objects.values_list('user_id', 'author_id').iterator(),
+            applied[0] if applied else 0, applied
+        )
+
+    def apply(self, change_id, user_id, author_id, added):
+        if added:
+            self.add(user_id, author_id)
+        else:
+            self.remove(user_id, author_id)
+        self.applied.add(change_id)
+        if change_id > self.version:
+            self.version = change_id
+            self.applied = {
+                applied for applied in self.applied
+                if applied > change_id - replay_overlap
+            }
+
+    def sync(self):
+        """
+        Применяет изменения из журнала, которых граф ещё не видел.
+        Возвращает себя или, после сброса и слишком длинного журнала,
+        граф, загруженный заново.
+        """
+        changes = list(FollowChange.objects.filter(
+            id__gt=self.version - replay_overlap
+        ).order_by('id').values_list(
+            'id', 'user_id', 'author_id', 'added'
+        )[:max_replay])
+        if len(changes) >= max_replay:
+            return FollowGraph.load()
+        for change_id, user_id, author_id, added in changes:
+            if change_id in self.applied:
+                continue
+            if user_id is None:
+                return FollowGraph.load()
+            self.apply(change_id, user_id, author_id, added)
+        self.synced_at = time.monotonic()
+        self.next_sync = self.synced_at + sync_interval
+        return self
+
+    def following_ids(self, user_id):
+        return self.following.get(user_id, empty)
+
+    def follower_ids(self, author_id):
+        return self.followers.get(author_id, empty)
+
+    def is_following(self, user_id, author_id):
+        return contains(self.following_ids(user_id), author_id)
+
+    def following_count(self, user_id):
+        return len(self.following_ids(user_id))
+
+    def follower_count(self, author_id):
+        return len(self.follower_ids(author_id))
+
+    def is_mutual(self, user_id, other_id):
+        return (
+            self.is_following(user_id, other_id)
+            and self.is_following(other_id, user_id)
+        )
+
+    def mutual(self, user_id):
+        """Отсортированные id тех, с кем подписка взаимная."""
+        followers = self.follower_ids(user_id)
+        return [
+            author_id for author_id in self.following_ids(user_id)
+            if contains(followers, author_id)
+        ]
+
+    def add(self, user_id, author_id):
+        for index, key, value in (
+            (self.following, user_id, author_id),
+            (self.followers, author_id, user_id),
+        ):
+            ids = index.setdefault(key, array(id_typecode))
+            position = bisect_left(ids, value)
+            if position == len(ids) or ids[position] != value:
+                ids.insert(position, value)
+
+    def remove(self, user_id, author_id):
+        for index, key, value in (
+            (self.following, user_id, author_id),
+            (self.followers, author_id, user_id),
+        ):
+            ids = index.get(key, empty)
+            position = bisect_left(ids, value)
+            if position < len(ids) and ids[position] == value:
+                del ids[position]
+
+
+def follow_graph():
+    """
+    Граф подписок процесса. Раз в sync_interval он сверяется с общим
+    журналом FollowChange одним запросом по первичному ключу, так что
+    подписки из других процессов видны не позже чем через интервал.
+    Граф, давно не сверявшийся с журналом, загружается заново: старые
+    записи журнала удаляются. Внутри транзакции граф всегда читается
+    из базы и не сохраняется: транзакция видит свои незакоммиченные
+    подписки.
+    """
+    global _graph
+    if connection.in_atomic_block:
+        return FollowGraph.load()
+    with _lock:
+        graph = _graph
+        now = time.monotonic()
+        if graph is None or now - graph.synced_at > change_retention / 2:
+            graph = FollowGraph.load()
+        elif now >= graph.next_sync:
+            graph = graph.sync()
+        _graph = graph
+    return graph
+
+
+def committed(change_id, user_id, author_id, added):
+    """
+    После commit изменение этого процесса применяется к графу на месте,
+    если до него в журнале ничего не пропущено; иначе граф сверится
+    с журналом при следующем обращении.
+    """
+    with _lock:
+        graph = _graph
+        if graph is None:
+            return
+        if user_id is not None and change_id == graph.version + 1:
+            graph.apply(change_id, user_id, author_id, added)
+        else:
+            graph.next_sync = 0
+
+
+def record_change(user_id, author_id, added):
+    """
+    Пишет изменение в журнал в транзакции самой подписки, поэтому
+    откаченная подписка в журнал не попадает. Время от времени удаляет
+    записи старше change_retention.
+    """
+    change = FollowChange.objects.create(
+        user_id=user_id, author_id=author_id, added=added
+    )
+    if change.id % prune_every == 0:
+        FollowChange.objects.filter(
+            pub_date__lt=timezone.now() - timedelta(seconds=change_retention)
+        ).delete()
+    transaction.on_commit(
+        partial(committed, change.id, user_id, author_id, added)
+    )
+    return change
+
+
+def bump_follow_version():
+    """
+    Сбрасывает графы всех процессов: нужно после записи подписок
+    в обход сигналов, например bulk_create.
+    """
+    record_change(None, None, True)
+
+
+def follow_saved(sender, instance, created, **kwargs):
+    """Сигнал post_save подписки."""
+    if created:
+        record_change(instance.user_id, instance.author_id, True)
+
+
+def follow_deleted(sender, instance, **kwargs):
+    """Сигнал post_delete подписки."""
+    record_change(instance.user_id, instance.author_id, False)
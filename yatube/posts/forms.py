@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.forms import ModelForm
 from .models import Post, Comment
 
@@ -7,6 +9,22 @@ class PostForm(ModelForm):
         model = Post
         fields = ['text', 'group', 'image']
 
+    def clean_image(self):
+        """
+        Отклоняет картинки со слишком большим разрешением. Размеры берутся
+        из заголовка, который ImageField уже прочитал, не декодируя пиксели.
+        """
+        image = self.cleaned_data.get('image')
+        header = getattr(image, 'image', None)
+        if header is not None:
+            width, height = header.size
+            if width * height > settings.POST_IMAGE_MAX_PIXELS:
+                raise ValidationError(
+                    'Слишком большое разрешение: %(width)sx%(height)s',
+                    params={'width': width, 'height': height},
+                )
+        return image
+
 
 class CommentForm(ModelForm):
     class Meta:
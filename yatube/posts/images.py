@@ -0,0 +1,148 @@
+import base64
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.urls import reverse
+from django.utils._os import safe_join
+from django.utils.crypto import salted_hmac
+
+from core import metrics
+
+placeholder_size: int = 16
+placeholder_blur: int = 1
+placeholder_quality: int = 40
+resize_salt: str = 'posts.images.resize'
+resize_signature_length: int = 16
+resize_signature_cache: int = 4096
+resize_cache_dir: str = 'resized'
+resize_version_length: int = 16
+resize_quality: int = 85
+resize_max_side: int = 2000
+resize_lock_stripes: int = 64
+
+_resize_locks = [threading.Lock() for _ in range(resize_lock_stripes)]
+
+
+def make_placeholder(image_file):
+    """
+    Строит крошечную размытую копию картинки и возвращает её
+    в виде data URI. При нечитаемом файле возвращает пустую строку.
+    """
+    # Pillow импортируется при первом использовании, а не при старте
+    # воркера: модуль подтягивают urls и шаблонные теги.
+    from PIL import Image, ImageFilter
+    try:
+        image_file.seek(0)
+        with Image.open(image_file) as image:
+            image.draft('RGB', (placeholder_size, placeholder_size))
+            image = image.convert('RGB')
+            image.thumbnail((placeholder_size, placeholder_size))
+            image = image.filter(ImageFilter.GaussianBlur(placeholder_blur))
+            buffer = BytesIO()
+            image.save(
+                buffer, format='JPEG', quality=placeholder_quality,
+                optimize=True
+            )
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return ''
+    image_file.seek(0)
+    encoded = base64.b64encode(buffer.getvalue()).decode('ascii')
+    return f'data:image/jpeg;base64,{encoded}'
+
+
+@lru_cache(maxsize=resize_signature_cache)
+def signature(secret, value):
+    digest = salted_hmac(resize_salt, value, secret=secret).hexdigest()
+    return digest[:resize_signature_length]
+
+
+def resize_signature(name, width, height):
+    """
+    Подпись параметров, чтобы нельзя было заказать любой размер.
+    Подписи кэшируются: лента подписывает одни и те же картинки
+    на каждый показ.
+    """
+    return signature(settings.SECRET_KEY, f'{width}x{height}/{name}')
+
+
+def resized_url(name, width, height):
+    return reverse('posts:image_resize', kwargs={
+        'signature': resize_signature(name, width, height),
+        'width': width,
+        'height': height,
+        'name': name,
+    })
+
+
+def source_version(name):
+    """
+    Версия исходника по размеру и mtime; None, если файла нет. Копии
+    с другой версией остались от заменённого файла.
+    """
+    try:
+        stat = os.stat(safe_join(settings.MEDIA_ROOT, name))
+    except (OSError, SuspiciousFileOperation):
+        return None
+    return hashlib.sha1(
+        f'{stat.st_size}:{stat.st_mtime_ns}'.encode()
+    ).hexdigest()[:resize_version_length]
+
+
+def resized_source(name):
+    """
+    Пара (исходник, версия) для файла копии resized/<исходник>/<версия>_...
+    относительно MEDIA_ROOT.
+    """
+    source, _, variant = name[len(resize_cache_dir) + 1:].rpartition('/')
+    return source, variant.partition('_')[0]
+
+
+def get_resized(name, width, height):
+    """
+    Возвращает путь к копии картинки размером width x height, создавая её
+    при первом обращении. Копии лежат в каталоге resized/<имя исходника>/,
+    а версия исходника в имени файла меняется при его замене, поэтому
+    clean_media находит копии удалённых и заменённых картинок по имени.
+    Одновременные запросы одного варианта в процессе ждут друг друга
+    на общем замке.
+    """
+    from PIL import Image, ImageOps
+
+    source = safe_join(settings.MEDIA_ROOT, name)
+    version = source_version(name)
+    if version is None:
+        raise FileNotFoundError(source)
+    directory = safe_join(settings.MEDIA_ROOT, resize_cache_dir, name)
+    target = os.path.join(directory, f'{version}_{width}x{height}.jpg')
+    if os.path.exists(target):
+        return target
+    with _resize_locks[hash(target) % resize_lock_stripes]:
+        if os.path.exists(target):
+            return target
+        started = time.perf_counter()
+        with Image.open(source) as image:
+            image.draft('RGB', (width, height))
+            resized = ImageOps.fit(
+                image.convert('RGB'), (width, height), Image.LANCZOS
+            )
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as output:
+                resized.save(
+                    output, format='JPEG', quality=resize_quality,
+                    optimize=True
+                )
+            os.replace(temporary, target)
+        except Exception:
+            os.remove(temporary)
+            raise
+        metrics.thumbnail_duration.observe(time.perf_counter() - started)
+    return target
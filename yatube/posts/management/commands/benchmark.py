@@ -0,0 +1,240 @@
+import json
+import platform
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases,
+    teardown_test_environment
+)
+from django.urls import reverse
+from PIL import Image
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from posts.models import Follow, Group, Post, User
+from posts.seeding import seed_dataset
+
+default_posts: int = 10000
+default_repeat: int = 20
+default_threshold: float = 0.25
+upload_side: int = 2000
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def compare_results(baseline, current, threshold):
+    """
+    Сравнивает замеры с сохранённой базой. Время и память считаются
+    регрессией при росте больше threshold, число запросов — при любом
+    росте. Возвращает список строк с описанием регрессий.
+    """
+    regressions = []
+    for view, metrics in current['views'].items():
+        base = baseline['views'].get(view)
+        if base is None:
+            continue
+        if metrics['queries'] > base['queries']:
+            regressions.append(
+                f'{view}: queries {base["queries"]} -> {metrics["queries"]}'
+            )
+        for metric in ('p50_ms', 'p95_ms', 'peak_kb'):
+            if base[metric] and metrics[metric] > base[metric] * (
+                1 + threshold
+            ):
+                regressions.append(
+                    f'{view}: {metric} {base[metric]} -> {metrics[metric]}'
+                )
+    return regressions
+
+
+def max_rss():
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def make_jpeg(side):
+    buffer = BytesIO()
+    Image.new('RGB', (side, side), (120, 160, 200)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет временную базу набором данных и замеряет p50/p95 '
+        'времени ответа, число SQL-запросов и пик памяти для публичных '
+        'view. Результаты пишутся в JSON и могут сравниваться с базой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=default_posts,
+            help='Размер набора данных: 10000, 100000, 1000000 и т.п.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=default_repeat,
+            help='Сколько раз запрашивать каждую страницу.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', help='Куда записать результаты в формате JSON.'
+        )
+        parser.add_argument(
+            '--compare', help='JSON с базовыми результатами для сравнения.'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=default_threshold,
+            help='Допустимый относительный рост времени и памяти.'
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.repeat = options['repeat']
+        media_root = tempfile.mkdtemp()
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                started = time.perf_counter()
+                created = seed_dataset(options['posts'], options['seed'])
+                self.stdout.write(
+                    f'Набор данных {created} создан за '
+                    f'{time.perf_counter() - started:.1f} с'
+                )
+                results = {
+                    'dataset': created,
+                    'python': platform.python_version(),
+                    'views': self.run_scenarios(),
+                }
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(media_root, ignore_errors=True)
+        for view, metrics in results['views'].items():
+            self.stdout.write(f'{view:24} {json.dumps(metrics)}')
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+            regressions = compare_results(
+                baseline, results, options['threshold']
+            )
+            if regressions:
+                raise CommandError(
+                    'Регрессии производительности:\n' + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def run_scenarios(self):
+        """Выбирает типичные страницы из набора данных и замеряет их."""
+        group = Group.objects.annotate(size=Count('posts')).latest('size')
+        author = User.objects.annotate(
+            size=Count('posts_for_author')
+        ).latest('size')
+        reader = User.objects.annotate(size=Count('follower')).latest('size')
+        post_ids = list(Post.objects.values_list('pk', flat=True)[:1000])
+        pages = max(Post.objects.count() // 10, 1)
+        anonymous = Client()
+        client = Client()
+        client.force_login(reader)
+
+        def page():
+            return f'?page={self.rng.randint(1, min(pages, 100))}'
+
+        scenarios = {
+            'posts:index': lambda: anonymous.get(
+                reverse('posts:index') + page()
+            ),
+            'posts:group_list': lambda: anonymous.get(
+                reverse('posts:group_list', args=[group.slug]) + page()
+            ),
+            'posts:profile': lambda: client.get(
+                reverse('posts:profile', args=[author.username]) + page()
+            ),
+            'posts:post_detail': lambda: anonymous.get(
+                reverse('posts:post_detail', args=[self.rng.choice(post_ids)])
+            ),
+            'posts:follow_index': lambda: client.get(
+                reverse('posts:follow_index') + page()
+            ),
+            'posts:post_create': lambda: client.post(
+                reverse('posts:post_create'),
+                data={'text': 'Новый пост', 'group': group.id}
+            ),
+            'posts:post_create_image': lambda: client.post(
+                reverse('posts:post_create'),
+                data={
+                    'text': 'Новый пост с картинкой',
+                    'image': SimpleUploadedFile(
+                        'bench.jpg', self.upload, content_type='image/jpeg'
+                    ),
+                }
+            ),
+            'posts:add_comment': lambda: client.post(
+                reverse('posts:add_comment', args=[self.rng.choice(post_ids)]),
+                data={'text': 'Новый комментарий'}
+            ),
+            'posts:profile_follow': lambda: self.toggle_follow(
+                client, reader, author
+            ),
+        }
+        self.upload = make_jpeg(upload_side)
+        return {
+            name: self.measure(request)
+            for name, request in scenarios.items()
+        }
+
+    def toggle_follow(self, client, reader, author):
+        if Follow.objects.filter(user=reader, author=author).exists():
+            name = 'posts:profile_unfollow'
+        else:
+            name = 'posts:profile_follow'
+        return client.get(reverse(name, args=[author.username]))
+
+    def measure(self, request):
+        """
+        Время меряется отдельно от памяти: tracemalloc заметно замедляет
+        запрос. rss_growth_kb показывает рост пикового RSS процесса,
+        включая память Pillow, которую tracemalloc не видит.
+        """
+        timings = []
+        queries = 0
+        for _ in range(self.repeat):
+            cache.clear()
+            started = time.perf_counter()
+            response = request()
+            timings.append((time.perf_counter() - started) * 1000)
+            queries = max(queries, response.wsgi_request.query_stats.count)
+        cache.clear()
+        rss_before = max_rss()
+        tracemalloc.start()
+        request()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        rss_after = max_rss()
+        return {
+            'p50_ms': round(percentile(timings, 0.5), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'queries': queries,
+            'peak_kb': peak // 1024,
+            'rss_growth_kb': rss_after - rss_before,
+        }
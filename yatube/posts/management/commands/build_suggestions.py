@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.suggestions import build_suggestions, numpy, top_suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации подписок «возможно, вы знаете» '
+        'по графу подписок: друзья друзей и авторы, которых читают '
+        'вместе. Запускается по расписанию, а не в запросе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top', type=int, default=top_suggestions,
+            help='Сколько рекомендаций хранить для пользователя.'
+        )
+        parser.add_argument(
+            '--no-numpy', action='store_true',
+            help='Считать без NumPy, даже если он установлен.'
+        )
+
+    def handle(self, *args, **options):
+        use_numpy = numpy is not None and not options['no_numpy']
+        started = time.perf_counter()
+        total = build_suggestions(options['top'], use_numpy)
+        self.stdout.write(
+            f'Рекомендаций: {total} за {time.perf_counter() - started:.1f} с'
+            f' ({"NumPy" if use_numpy else "array"})'
+        )
@@ -0,0 +1,131 @@
+import re
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.template import Context, Engine
+from django.utils import timezone
+
+from posts.models import Group, Post, User
+
+default_posts: int = 10
+default_number: int = 200
+default_repeat: int = 5
+whitespace_re = re.compile(r'\s+')
+tag_space_re = re.compile(r'\s*([<>])\s*')
+
+# Карточка в том виде, в каком она была до {% post_card %}.
+include_card = '''{% load resize %}
+<ul>
+  <li>
+    Автор: {{ post.author.get_full_name }}
+  </li>
+  <li>
+    Дата публикации: {{ post.pub_date|date:"d E Y" }}
+  </li>
+</ul>
+{% if post.image %}
+  <img class="card-img my-2" src="{% resized_url post.image '960x339' %}" \
+width="960" height="339" loading="lazy"
+    {% if post.image_placeholder %}style="background: \
+url({{ post.image_placeholder }}) center / cover no-repeat"{% endif %}>
+{% endif %}
+<p>{{ post.text }}</p>'''
+include_feed = '''{% for post in page_obj %}
+  <article>
+    {% include 'card.html' %}
+    <a type="button" class="btn btn-outline-primary" \
+href="{% url 'posts:profile' post.author %}">
+      все посты пользователя
+    </a>
+    {% if post.group %}
+      <a type="button" class="btn btn-outline-primary" \
+href="{% url 'posts:group_list' post.group.slug %}">
+        все записи группы
+      </a>
+    {% endif %}
+  </article>
+{% endfor %}'''
+tag_feed = '''{% load cards %}{% for post in page_obj %}
+  {% post_card post 'profile' 'group' %}
+{% endfor %}'''
+
+
+def make_posts(count):
+    """Посты в памяти, без базы: половина с группой и картинкой."""
+    now = timezone.now()
+    posts = []
+    for number in range(count):
+        author = User(
+            id=number, username=f'user{number}', first_name='Имя',
+            last_name=f'Фамилия <{number}>'
+        )
+        post = Post(
+            id=number, author=author, pub_date=now,
+            text=f'Текст поста № {number} & "кавычки"'
+        )
+        if number % 2:
+            post.group = Group(id=number, slug=f'group-{number}')
+            post.image = f'posts/{number}.jpg'
+            post.image_placeholder = 'data:image/jpeg;base64,AAAA'
+        posts.append(post)
+    return posts
+
+
+def normalize(html):
+    """HTML без незначащих пробелов вокруг тегов."""
+    return tag_space_re.sub(r'\1', whitespace_re.sub(' ', html)).strip()
+
+
+class Command(BaseCommand):
+    help = (
+        'Микробенчмарк рендера страницы ленты: карточки через include '
+        'и {% url %} против тега {% post_card %}.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=default_posts,
+            help='Постов на странице.'
+        )
+        parser.add_argument(
+            '--number', type=int, default=default_number,
+            help='Рендеров страницы в одном замере.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=default_repeat,
+            help='Число замеров; берётся лучший.'
+        )
+
+    def handle(self, *args, **options):
+        engine = Engine(
+            loaders=[('django.template.loaders.locmem.Loader', {
+                'card.html': include_card,
+                'include.html': include_feed,
+                'tag.html': tag_feed,
+            })],
+            libraries={
+                'cards': 'posts.templatetags.cards',
+                'resize': 'posts.templatetags.resize',
+            }
+        )
+        context = {'page_obj': make_posts(options['posts'])}
+        results = {}
+        for name in ('include', 'tag'):
+            template = engine.get_template(f'{name}.html')
+
+            def render():
+                return template.render(Context(context))
+
+            results[name] = render()
+            best = min(timeit.repeat(
+                render, number=options['number'], repeat=options['repeat']
+            ))
+            results[f'{name}_ms'] = best / options['number'] * 1000
+            self.stdout.write(
+                f'{name:8} {results[f"{name}_ms"]:.3f} мс на страницу'
+            )
+        if normalize(results['include']) != normalize(results['tag']):
+            self.stderr.write('Карточки отличаются от шаблона с include')
+        self.stdout.write(
+            f'Ускорение: x{results["include_ms"] / results["tag_ms"]:.1f}'
+        )
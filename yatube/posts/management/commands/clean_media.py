@@ -0,0 +1,182 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default, delete
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from posts.images import resize_cache_dir, resized_source, source_version
+from posts.models import Post
+
+default_batch_size: int = 500
+default_min_age: int = 60 * 60
+
+
+def path_key(name):
+    """Ключ сортировки, одинаковый для файловой системы и БД."""
+    return tuple(name.split('/'))
+
+
+def walk_sorted(root, prefix=''):
+    """
+    Отдаёт пары (имя, mtime) для файлов под root в отсортированном
+    порядке. В памяти держится только листинг текущего каталога.
+    """
+    try:
+        with os.scandir(root) as entries:
+            entries = sorted(entries, key=lambda entry: entry.name)
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        name = prefix + entry.name
+        if entry.is_dir(follow_symlinks=False):
+            yield from walk_sorted(entry.path, name + '/')
+        elif entry.is_file(follow_symlinks=False):
+            yield name, entry.stat().st_mtime
+
+
+def referenced_images(chunk_size):
+    """
+    Имена картинок постов из БД. Порядок сортировки зависит от collation
+    базы и может не совпасть с walk_sorted, поэтому слияние с ним — только
+    предварительный отбор: перед удалением пакет проверяется в БД заново.
+    """
+    return (
+        Post.objects.exclude(image='')
+        .order_by('image')
+        .values_list('image', flat=True)
+        .distinct()
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def still_referenced(names):
+    """Имена из пакета, на которые всё-таки ссылается пост."""
+    return set(
+        Post.objects.filter(image__in=names).values_list('image', flat=True)
+    )
+
+
+def unreferenced(files, referenced):
+    """Слияние двух отсортированных потоков: файлы без ссылок из БД."""
+    referenced = iter(referenced)
+    current = next(referenced, None)
+    for name, mtime in files:
+        key = path_key(name)
+        while current is not None and path_key(current) < key:
+            current = next(referenced, None)
+        if current is None or path_key(current) != key:
+            yield name, mtime
+
+
+def stale_copies(files):
+    """
+    Копии resized, исходник которых удалён или заменён. Файлы идут
+    отсортированными, поэтому копии одного исходника стоят подряд и его
+    версия считается один раз.
+    """
+    source, version = None, None
+    for name, mtime in files:
+        copy_source, copy_version = resized_source(name)
+        if copy_source != source:
+            source, version = copy_source, source_version(copy_source)
+        if version is None or copy_version != version:
+            yield name, mtime
+
+
+def batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из MEDIA_ROOT картинки, на которые не ссылается ни один '
+        'пост, вместе с их миниатюрами sorl-thumbnail и копиями resized.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=default_batch_size,
+            help='Сколько файлов удалять за один проход.'
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=default_min_age,
+            help='Не трогать файлы моложе указанного числа секунд.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено.'
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.dry_run = options['dry_run']
+        self.deadline = time.time() - options['min_age']
+        upload_to = Post._meta.get_field('image').upload_to.strip('/')
+        originals = self.collect(
+            unreferenced(
+                walk_sorted(
+                    os.path.join(settings.MEDIA_ROOT, upload_to),
+                    upload_to + '/'
+                ),
+                referenced_images(self.batch_size)
+            ),
+            delete,
+            still_referenced
+        )
+        thumbnail_prefix = thumbnail_settings.THUMBNAIL_PREFIX.strip('/')
+        thumbnails = self.collect(
+            self.unknown_thumbnails(walk_sorted(
+                os.path.join(settings.MEDIA_ROOT, thumbnail_prefix),
+                thumbnail_prefix + '/'
+            )),
+            default_storage.delete
+        )
+        copies = self.collect(
+            stale_copies(walk_sorted(
+                os.path.join(settings.MEDIA_ROOT, resize_cache_dir),
+                resize_cache_dir + '/'
+            )),
+            default_storage.delete
+        )
+        verb = 'Найдено' if self.dry_run else 'Удалено'
+        self.stdout.write(
+            f'{verb} картинок: {originals}, миниатюр: {thumbnails}, '
+            f'копий: {copies}'
+        )
+
+    def unknown_thumbnails(self, files):
+        """Миниатюры, о которых не знает хранилище ключей sorl."""
+        for name, mtime in files:
+            if default.kvstore.get(ImageFile(name)) is None:
+                yield name, mtime
+
+    def collect(self, candidates, remove, keep=None):
+        """
+        Удаляет кандидатов пакетами; keep(names) возвращает имена пакета,
+        которые трогать нельзя.
+        """
+        fresh = ((name, mtime) for name, mtime in candidates
+                 if mtime < self.deadline)
+        count = 0
+        for batch in batches(fresh, self.batch_size):
+            if keep is not None:
+                kept = keep([name for name, _ in batch])
+                batch = [item for item in batch if item[0] not in kept]
+            for name, _ in batch:
+                if self.dry_run:
+                    self.stdout.write(name)
+                else:
+                    remove(name)
+            count += len(batch)
+        return count
@@ -0,0 +1,366 @@
+import http.client
+import json
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+default_url: str = 'http://127.0.0.1:8000'
+default_concurrency: int = 10
+default_duration: float = 30.0
+default_logged_in: float = 0.5
+sample_size: int = 1000
+pages: int = 20
+request_timeout: float = 30.0
+histogram_sub_bucket_bits: int = 7
+reported_percentiles: tuple = (50, 90, 99, 99.9)
+
+# Вес сценария — доля запросов этого типа у клиента.
+anonymous_mix: dict = {
+    'posts:index': 40,
+    'posts:group_list': 15,
+    'posts:profile': 15,
+    'posts:post_detail': 30,
+}
+logged_in_mix: dict = {
+    'posts:index': 20,
+    'posts:follow_index': 30,
+    'posts:post_detail': 25,
+    'posts:profile': 10,
+    'posts:add_comment': 10,
+    'posts:profile_follow': 5,
+}
+
+
+class LatencyHistogram:
+    """
+    Гистограмма задержек в духе HdrHistogram: значения в микросекундах
+    раскладываются по корзинам с 2 ** sub_bucket_bits делениями на
+    каждую степень двойки, поэтому относительная ошибка перцентилей
+    не превышает 1 / 2 ** sub_bucket_bits при постоянной памяти.
+    """
+
+    def __init__(self, sub_bucket_bits=histogram_sub_bucket_bits):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.counts = Counter()
+        self.total = 0
+        self.max = 0
+
+    def bucket(self, value):
+        shift = max(value.bit_length() - self.sub_bucket_bits, 0)
+        return shift, value >> shift
+
+    def record(self, seconds):
+        value = max(int(seconds * 1_000_000), 0)
+        self.counts[self.bucket(value)] += 1
+        self.total += 1
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent):
+        """Верхняя граница корзины, в которую попадает перцентиль, в мс."""
+        if not self.total:
+            return 0.0
+        rank = max(percent / 100 * self.total, 1)
+        seen = 0
+        for shift, sub_bucket in sorted(
+            self.counts, key=lambda bucket: bucket[1] << bucket[0]
+        ):
+            seen += self.counts[shift, sub_bucket]
+            if seen >= rank:
+                upper = ((sub_bucket + 1) << shift) - 1
+                return min(upper, self.max) / 1000
+        return self.max / 1000
+
+
+class Stats:
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.statuses = Counter()
+        self.errors = 0
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        self.statuses.update(other.statuses)
+        self.errors += other.errors
+
+
+def login_session(user):
+    """
+    Создаёт сессию пользователя напрямую в базе, как это делает
+    Client.force_login: нагрузка идёт на ту же базу, что и у цели.
+    """
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return session.session_key
+
+
+class LoadClient(threading.Thread):
+    """Один клиент с keep-alive соединением и своим набором кук."""
+
+    def __init__(self, target, dataset, mix, session_key, seed, deadline):
+        super().__init__(daemon=True)
+        self.target = target
+        self.dataset = dataset
+        self.mix = list(mix)
+        self.weights = list(mix.values())
+        self.rng = random.Random(seed)
+        self.deadline = deadline
+        self.cookies = {}
+        if session_key:
+            self.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        self.connection = None
+        self.stats = defaultdict(Stats)
+
+    def connect(self):
+        connection_class = (
+            http.client.HTTPSConnection if self.target.scheme == 'https'
+            else http.client.HTTPConnection
+        )
+        self.connection = connection_class(
+            self.target.hostname, self.target.port, timeout=request_timeout
+        )
+
+    def request(self, method, path, body=None):
+        if self.connection is None:
+            self.connect()
+        headers = {'Host': self.target.netloc}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items()
+            )
+        if body is not None:
+            body = urlencode(body)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.cookies.get(
+                settings.CSRF_COOKIE_NAME, ''
+            )
+        try:
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            raise
+        for header in response.headers.get_all('Set-Cookie') or []:
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        if response.will_close:
+            self.connection.close()
+            self.connection = None
+        return response.status
+
+    def page(self):
+        return '?' + urlencode({'page': self.rng.randint(1, pages)})
+
+    def next_request(self, name):
+        """
+        Запрос для выбранного имени URL: (имя, метод, путь, тело). Имя
+        может смениться: половина подписок становится отписками.
+        """
+        rng = self.rng
+        dataset = self.dataset
+        if name in ('posts:index', 'posts:follow_index'):
+            return name, 'GET', reverse(name) + self.page(), None
+        if name == 'posts:group_list':
+            slug = rng.choice(dataset['groups'])
+            return (
+                name, 'GET', reverse(name, args=[slug]) + self.page(), None
+            )
+        if name == 'posts:profile':
+            username = rng.choice(dataset['authors'])
+            return (
+                name, 'GET', reverse(name, args=[username]) + self.page(),
+                None
+            )
+        if name == 'posts:post_detail':
+            post_id = rng.choice(dataset['posts'])
+            return name, 'GET', reverse(name, args=[post_id]), None
+        if name == 'posts:add_comment':
+            post_id = rng.choice(dataset['posts'])
+            return name, 'POST', reverse(name, args=[post_id]), {
+                'text': f'Нагрузочный комментарий {rng.random()}'
+            }
+        username = rng.choice(dataset['authors'])
+        if rng.random() < 0.5:
+            name = 'posts:profile_unfollow'
+        return name, 'GET', reverse(name, args=[username]), None
+
+    def run(self):
+        if settings.SESSION_COOKIE_NAME in self.cookies:
+            # Кука csrftoken нужна для POST-запросов комментариев.
+            self.safe_request('GET', reverse('posts:post_create'))
+        while time.monotonic() < self.deadline:
+            name = self.rng.choices(self.mix, weights=self.weights)[0]
+            name, method, path, body = self.next_request(name)
+            stats = self.stats[name]
+            started = time.perf_counter()
+            status = self.safe_request(method, path, body)
+            stats.latency.record(time.perf_counter() - started)
+            if status is None or status >= 500:
+                stats.errors += 1
+            if status is not None:
+                stats.statuses[status] += 1
+        if self.connection is not None:
+            self.connection.close()
+
+    def safe_request(self, method, path, body=None):
+        try:
+            return self.request(method, path, body)
+        except (OSError, http.client.HTTPException):
+            return None
+
+
+def load_dataset():
+    """Выбирает существующие объекты, к которым будут обращаться клиенты."""
+    dataset = {
+        'posts': list(
+            Post.objects.order_by('-pk').values_list('pk', flat=True)
+            [:sample_size]
+        ),
+        'groups': list(
+            Group.objects.values_list('slug', flat=True)[:sample_size]
+        ),
+        'authors': list(
+            User.objects.filter(posts_for_author__isnull=False).distinct()
+            .values_list('username', flat=True)[:sample_size]
+        ),
+    }
+    empty = [key for key, values in dataset.items() if not values]
+    if empty:
+        raise CommandError(
+            'В базе нет данных для нагрузки: ' + ', '.join(empty)
+            + '. Заполните её командой seed.'
+        )
+    return dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает запущенный экземпляр yatube смесью запросов анонимных '
+        'и авторизованных клиентов и печатает пропускную способность '
+        'и перцентили задержек для каждого имени URL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default=default_url, help='Адрес запущенного сайта.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=default_concurrency,
+            help='Число одновременных клиентов.'
+        )
+        parser.add_argument(
+            '--duration', type=float, default=default_duration,
+            help='Длительность нагрузки в секундах.'
+        )
+        parser.add_argument(
+            '--logged-in', type=float, default=default_logged_in,
+            help='Доля авторизованных клиентов, от 0 до 1.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', help='Куда записать результаты в формате JSON.'
+        )
+
+    def handle(self, *args, **options):
+        target = urlsplit(options['url'])
+        if target.scheme not in ('http', 'https') or not target.hostname:
+            raise CommandError(f'Неверный адрес: {options["url"]}')
+        dataset = load_dataset()
+        rng = random.Random(options['seed'])
+        logged_in = round(options['concurrency'] * options['logged_in'])
+        readers = list(
+            User.objects.filter(follower__isnull=False).distinct()
+            .order_by('pk')[:sample_size]
+        ) or list(User.objects.order_by('pk')[:sample_size])
+        started = time.monotonic()
+        deadline = started + options['duration']
+        clients = []
+        for number in range(options['concurrency']):
+            if number < logged_in:
+                mix = logged_in_mix
+                session_key = login_session(rng.choice(readers))
+            else:
+                mix = anonymous_mix
+                session_key = None
+            clients.append(LoadClient(
+                target, dataset, mix, session_key,
+                rng.randrange(2 ** 32), deadline
+            ))
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed = time.monotonic() - started
+
+        stats = defaultdict(Stats)
+        for client in clients:
+            for name, client_stats in client.stats.items():
+                stats[name].merge(client_stats)
+        results = {
+            name: self.summary(item, elapsed)
+            for name, item in sorted(stats.items())
+        }
+        total = sum(item.latency.total for item in stats.values())
+        self.stdout.write(
+            f'{total} запросов за {elapsed:.1f} с, '
+            f'{total / elapsed:.1f} запросов/с'
+        )
+        header = ['rps'] + [f'p{p}' for p in reported_percentiles]
+        self.stdout.write(
+            f'{"url":24}' + ''.join(f'{column:>10}' for column in header)
+            + f'{"max":>10}{"errors":>8}'
+        )
+        for name, summary in results.items():
+            self.stdout.write(
+                f'{name:24}{summary["rps"]:>10.1f}'
+                + ''.join(
+                    f'{summary["p" + str(p)]:>10.1f}'
+                    for p in reported_percentiles
+                )
+                + f'{summary["max"]:>10.1f}{summary["errors"]:>8}'
+            )
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({
+                    'concurrency': options['concurrency'],
+                    'duration': elapsed,
+                    'requests': total,
+                    'urls': results,
+                }, output, indent=2, sort_keys=True)
+
+    def summary(self, stats, elapsed):
+        """Задержки в миллисекундах; статусы — для поиска 4xx и 5xx."""
+        summary = {
+            'requests': stats.latency.total,
+            'rps': stats.latency.total / elapsed,
+            'max': stats.latency.max / 1000,
+            'errors': stats.errors,
+            'statuses': {
+                str(status): count
+                for status, count in sorted(stats.statuses.items())
+            },
+        }
+        for percent in reported_percentiles:
+            summary[f'p{percent}'] = stats.latency.percentile(percent)
+        return summary
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.seeding import seed_dataset
+
+default_posts: int = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу детерминированным набором пользователей, групп, '
+        'постов, комментариев и подписок для воспроизведения нагрузки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=default_posts,
+            help='Сколько постов создать.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора: одно зерно даёт один и тот же набор.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Число процессов, пишущих посты в свои диапазоны id.'
+        )
+        parser.add_argument(
+            '--images', action='store_true',
+            help='Прикрепить к половине постов картинки из общего пула.'
+        )
+        parser.add_argument(
+            '--fake-text', action='store_true',
+            help='Генерировать тексты и имена через Faker (медленнее).'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        created = seed_dataset(
+            options['posts'],
+            seed=options['seed'],
+            workers=options['workers'],
+            images=options['images'],
+            fake_text=options['fake_text']
+        )
+        elapsed = time.perf_counter() - started
+        for model, count in created.items():
+            self.stdout.write(f'{model}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Готово за {elapsed:.1f} с'))
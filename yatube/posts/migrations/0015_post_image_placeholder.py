@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-19 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_auto_20220805_0725'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_placeholder',
+            field=models.TextField(blank=True, editable=False, help_text='Размытая миниатюра картинки в формате data URI', verbose_name='Заглушка картинки'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-19 20:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_followsuggestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FollowChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(auto_now_add=True, verbose_name='Дата публикации')),
+                ('user_id', models.IntegerField(null=True, verbose_name='Подписчик')),
+                ('author_id', models.IntegerField(null=True, verbose_name='Автор')),
+                ('added', models.BooleanField(default=True, verbose_name='Подписка добавлена')),
+            ],
+            options={
+                'verbose_name': 'Изменение подписки',
+                'verbose_name_plural': 'Изменения подписок',
+            },
+        ),
+    ]
@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from core.models import CreatedModel
+from core.tasks import enqueue
+from posts.feeds import bump_feed_version
 from django.contrib.auth import get_user_model
 
 
@@ -46,15 +48,53 @@ class Post(CreatedModel):
         blank=True,
         help_text='Картинка нового поста'
     )
+    image_placeholder = models.TextField(
+        'Заглушка картинки',
+        blank=True,
+        editable=False,
+        help_text='Размытая миниатюра картинки в формате data URI'
+    )
 
     class Meta(type):
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
         ordering = ['-pub_date']
+        # Ключи ленты и курсора API: (pub_date, id) без сортировки в памяти.
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'], name='post_feed_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_feed_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_feed_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:quantity_letters]
 
+    def save(self, *args, **kwargs):
+        """
+        Сбрасывает заглушку при смене картинки и ставит её пересчёт
+        в фоновую очередь, чтобы не декодировать картинку в запросе.
+        Новый пост после commit сбрасывает закэшированную версию ленты.
+        """
+        image_changed = bool(self.image) and not self.image._committed
+        if image_changed or not self.image:
+            self.image_placeholder = ''
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding:
+            transaction.on_commit(bump_feed_version)
+        if image_changed:
+            enqueue(
+                'posts.tasks.build_image_placeholder',
+                post_id=self.pk,
+                image=self.image.name
+            )
+
 
 class Comment(CreatedModel):
     post = models.ForeignKey(
@@ -108,3 +148,49 @@ class Follow(CreatedModel):
 
     def __str__(self):
         return self.user.username
+
+
+class FollowChange(CreatedModel):
+    """
+    Журнал изменений подписок, общий для всех процессов: по нему графы
+    подписок в памяти процессов догоняют базу. Запись без user_id
+    требует загрузить граф заново.
+    """
+    user_id = models.IntegerField('Подписчик', null=True)
+    author_id = models.IntegerField('Автор', null=True)
+    added = models.BooleanField('Подписка добавлена', default=True)
+
+    class Meta(type):
+        verbose_name = 'Изменение подписки'
+        verbose_name_plural = 'Изменения подписок'
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.author_id}'
+
+
+class FollowSuggestion(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggested_to'
+    )
+    score = models.FloatField('Оценка')
+
+    class Meta(type):
+        verbose_name = 'Рекомендация подписки'
+        verbose_name_plural = 'Рекомендации подписок'
+        ordering = ['-score']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow_suggestion'
+            ),
+        ]
+
+    def __str__(self):
+        return self.user.username
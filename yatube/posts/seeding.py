@@ -0,0 +1,270 @@
+import multiprocessing
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from itertools import accumulate
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from faker import Faker
+from PIL import Image
+
+from .follow_graph import bump_follow_version
+from .images import make_placeholder
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+batch_size: int = 2000
+chunk_size: int = 50000
+posts_per_user: int = 20
+posts_per_group: int = 1000
+comments_per_post: int = 2
+follows_per_user: int = 10
+zipf_exponent: float = 1.1
+grouped_share: float = 0.7
+image_pool_size: int = 20
+image_size: tuple = (960, 640)
+# Даты набора отсчитываются от фиксированного момента, а не от now():
+# иначе одно и то же зерно давало бы разные данные.
+seed_start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+post_interval: int = 60
+comment_delay: int = 24 * 60 * 60
+
+
+def zipf_weights(size):
+    """Накопленные веса для выбора по степенному закону."""
+    return list(accumulate(1 / (rank + 1) ** zipf_exponent
+                           for rank in range(size)))
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+@contextmanager
+def explicit_dates(*models):
+    """
+    Временно выключает auto_now_add у pub_date моделей: иначе
+    bulk_create заменит даты набора текущим временем.
+    """
+    fields = [model._meta.get_field('pub_date') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def post_date(rng, index):
+    """Дата поста с номером index в наборе: растёт вместе с id."""
+    return seed_start + timedelta(
+        seconds=(index + rng.random()) * post_interval
+    )
+
+
+def bulk_insert(model, objects):
+    """Пишет поток объектов пачками, не держа его целиком в памяти."""
+    batch = []
+    total = 0
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def reset_sequences(*models):
+    """
+    Сдвигает последовательности первичных ключей за вставленные явно id,
+    иначе следующий обычный INSERT в PostgreSQL получит занятый ключ.
+    В SQLite список команд пуст.
+    """
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def make_faker(seed):
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    return fake
+
+
+def make_images(rng, count):
+    """
+    Кладёт в хранилище небольшой пул картинок, общий для всех постов,
+    и возвращает пары (имя, заглушка).
+    """
+    images = []
+    for number in range(count):
+        color = tuple(rng.randrange(256) for _ in range(3))
+        buffer = BytesIO()
+        Image.new('RGB', image_size, color).save(buffer, 'JPEG')
+        content = ContentFile(buffer.getvalue())
+        name = f'posts/seed_{number}.jpg'
+        if not default_storage.exists(name):
+            name = default_storage.save(name, content)
+        images.append((name, make_placeholder(content)))
+    return images
+
+
+def seed_posts_chunk(task):
+    """
+    Создаёт посты с id из [first_post, first_post + count) и комментарии
+    к ним. Генератор случайных чисел зависит только от зерна и номера
+    куска, поэтому результат не зависит от числа процессов.
+    """
+    (seed, chunk, first_post, count, user_ids, group_ids, images,
+     fake_text) = task
+    first_index = chunk * chunk_size
+    rng = random.Random(f'{seed}:{chunk}')
+    fake = make_faker(seed * 100003 + chunk) if fake_text else None
+    user_weights = zipf_weights(len(user_ids))
+    group_weights = zipf_weights(len(group_ids))
+    post_ids = range(first_post, first_post + count)
+
+    def text(default):
+        if fake is None:
+            return default
+        return fake.paragraph(nb_sentences=rng.randint(1, 6))
+
+    def author():
+        return rng.choices(user_ids, cum_weights=user_weights)[0]
+
+    dates = {}
+
+    def post(pk):
+        image, placeholder = '', ''
+        if images and rng.random() < 0.5:
+            image, placeholder = rng.choice(images)
+        dates[pk] = post_date(rng, first_index + pk - first_post)
+        return Post(
+            id=pk,
+            pub_date=dates[pk],
+            text=text(f'Тестовый пост № {pk}'),
+            author_id=author(),
+            group_id=(
+                rng.choices(group_ids, cum_weights=group_weights)[0]
+                if rng.random() < grouped_share else None
+            ),
+            image=image,
+            image_placeholder=placeholder
+        )
+
+    with transaction.atomic(), explicit_dates(Post, Comment):
+        posts = bulk_insert(Post, (post(pk) for pk in post_ids))
+        comments = bulk_insert(Comment, (
+            Comment(
+                post_id=pk,
+                pub_date=dates[pk] + timedelta(
+                    seconds=rng.random() * comment_delay
+                ),
+                author_id=author(),
+                text=text(f'Комментарий к посту {pk}')
+            )
+            for pk in post_ids
+            for _ in range(rng.randint(0, 2 * comments_per_post))
+        ))
+    return posts, comments
+
+
+def setup_worker():
+    django.setup()
+
+
+def seed_dataset(posts, seed=0, workers=1, images=False, fake_text=False):
+    """
+    Заполняет базу детерминированным набором данных на posts постов:
+    авторы, группы и подписки распределены по степенному закону,
+    у поста в среднем comments_per_post комментариев. Даты постов
+    идут от seed_start примерно через post_interval секунд в порядке id.
+    Первичные ключи задаются явно, поэтому посты можно писать кусками
+    в нескольких процессах, каждый в своём диапазоне id; после вставки
+    последовательности ключей сдвигаются. Для workers > 1 нужна
+    база, доступная из разных процессов, а не SQLite в памяти.
+    Возвращает словарь с количеством созданных объектов.
+    """
+    rng = random.Random(seed)
+    fake = make_faker(seed) if fake_text else None
+    users = max(posts // posts_per_user, 2)
+    groups = max(posts // posts_per_group, 1)
+    password = make_password(None)
+
+    first_user = next_id(User)
+    user_ids = range(first_user, first_user + users)
+    created = {'users': bulk_insert(User, (
+        User(
+            id=pk,
+            username=f'user{pk}',
+            password=password,
+            date_joined=seed_start,
+            first_name=fake.first_name() if fake else '',
+            last_name=fake.last_name() if fake else ''
+        )
+        for pk in user_ids
+    ))}
+
+    first_group = next_id(Group)
+    group_ids = range(first_group, first_group + groups)
+    created['groups'] = bulk_insert(Group, (
+        Group(
+            id=pk,
+            title=fake.catch_phrase() if fake else f'Группа {pk}',
+            slug=f'group-{pk}',
+            description=fake.sentence() if fake else f'Описание группы {pk}'
+        )
+        for pk in group_ids
+    ))
+
+    user_weights = zipf_weights(users)
+
+    def follows():
+        for user_id in user_ids:
+            authors = set(rng.choices(
+                user_ids, cum_weights=user_weights,
+                k=rng.randint(1, 2 * follows_per_user)
+            ))
+            authors.discard(user_id)
+            for author_id in sorted(authors):
+                yield Follow(
+                    user_id=user_id, author_id=author_id,
+                    pub_date=post_date(rng, rng.randrange(posts))
+                )
+
+    with explicit_dates(Follow):
+        created['follows'] = bulk_insert(Follow, follows())
+    # bulk_create не шлёт сигналов, поэтому графы подписок сбрасываются явно.
+    bump_follow_version()
+
+    image_pool = make_images(rng, image_pool_size) if images else []
+    first_post = next_id(Post)
+    tasks = [
+        (seed, chunk, first_post + start, min(chunk_size, posts - start),
+         user_ids, group_ids, image_pool, fake_text)
+        for chunk, start in enumerate(range(0, posts, chunk_size))
+    ]
+    if workers > 1 and len(tasks) > 1:
+        connections.close_all()
+        with multiprocessing.Pool(workers, initializer=setup_worker) as pool:
+            results = pool.map(seed_posts_chunk, tasks)
+    else:
+        results = [seed_posts_chunk(task) for task in tasks]
+    created['posts'] = sum(posts for posts, _ in results)
+    created['comments'] = sum(comments for _, comments in results)
+    reset_sequences(User, Group, Post)
+    return created
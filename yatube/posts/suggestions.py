@@ -0,0 +1,238 @@
+import heapq
+from array import array
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import Follow, FollowSuggestion, User
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+id_typecode: str = 'l'
+top_suggestions: int = 10
+batch_users: int = 1000
+insert_batch: int = 2000
+friend_weight: float = 1.0
+cofollow_weight: float = 0.5
+# Сколько подписчиков автора и подписок соседа учитывать: у популярных
+# авторов тысячи подписчиков, и без ограничения пакет не влезет в память.
+max_neighbours: int = 100
+# Оценки округляются, чтобы порядок равных кандидатов не зависел от
+# порядка сложения чисел с плавающей точкой.
+score_digits: int = 9
+
+
+class Adjacency:
+    """Списки смежности в формате CSR: соседи i — indices[indptr[i]:...]."""
+
+    def __init__(self, indptr, indices):
+        self.indptr = indptr
+        self.indices = indices
+
+    def neighbours(self, node):
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def as_numpy(self):
+        return Adjacency(
+            numpy.frombuffer(self.indptr, dtype=self.indptr.typecode),
+            numpy.frombuffer(self.indices, dtype=self.indices.typecode)
+        )
+
+
+def adjacency(pairs, position, size):
+    """CSR из пар (источник, цель), упорядоченных по источнику."""
+    indptr = array(id_typecode, [0]) * (size + 1)
+    indices = array(id_typecode)
+    for source, target in pairs:
+        indptr[position[source] + 1] += 1
+        indices.append(position[target])
+    for node in range(size):
+        indptr[node + 1] += indptr[node]
+    return Adjacency(indptr, indices)
+
+
+def load_graph():
+    """
+    Таблица Follow в виде двух CSR над плотными номерами пользователей:
+    подписки и подписчики. Возвращает (ids, following, followers), где
+    ids[номер] — id пользователя.
+    """
+    ids = array(id_typecode, User.objects.order_by('id').values_list(
+        'id', flat=True
+    ).iterator())
+    position = {pk: node for node, pk in enumerate(ids)}
+    edges = Follow.objects.values_list('user_id', 'author_id')
+    following = adjacency(
+        edges.order_by('user_id', 'author_id').iterator(), position,
+        len(ids)
+    )
+    followers = adjacency(
+        edges.order_by('author_id', 'user_id').values_list(
+            'author_id', 'user_id'
+        ).iterator(), position, len(ids)
+    )
+    return ids, following, followers
+
+
+def suggest_python(users, following, followers, top):
+    """
+    Оценки кандидатов: друзья друзей (u -> a -> b) и авторы, которых
+    читают вместе с авторами пользователя (u -> a <- v -> b). Вклад
+    второго пути делится на число учтённых подписчиков a, чтобы
+    популярные авторы не забивали рекомендации.
+    """
+    for user in users:
+        followed = following.neighbours(user)
+        scores = defaultdict(float)
+        for author in followed:
+            for candidate in following.neighbours(author):
+                scores[candidate] += friend_weight
+            others = followers.neighbours(author)[:max_neighbours]
+            weight = cofollow_weight / len(others)
+            for other in others:
+                if other == user:
+                    continue
+                neighbours = following.neighbours(other)[:max_neighbours]
+                for candidate in neighbours:
+                    scores[candidate] += weight
+        skip = set(followed)
+        skip.add(user)
+        best = heapq.nsmallest(top, (
+            (-round(score, score_digits), candidate)
+            for candidate, score in scores.items() if candidate not in skip
+        ))
+        yield user, [(candidate, -score) for score, candidate in best]
+
+
+def expand(graph, nodes, rows, weights, cap=None):
+    """
+    Векторный обход рёбер: для каждого узла nodes[i] выдаёт его соседей
+    (не больше cap) вместе с rows[i] и weights[i].
+    """
+    starts = graph.indptr[nodes]
+    lengths = graph.indptr[nodes + 1] - starts
+    if cap is not None:
+        lengths = numpy.minimum(lengths, cap)
+    offsets = numpy.arange(lengths.sum()) - numpy.repeat(
+        numpy.cumsum(lengths) - lengths, lengths
+    )
+    return (
+        numpy.repeat(rows, lengths),
+        graph.indices[numpy.repeat(starts, lengths) + offsets],
+        numpy.repeat(weights, lengths),
+    )
+
+
+def suggest_batch(users, following, followers, size, top):
+    """Те же оценки, что suggest_python, сразу для пакета пользователей."""
+    rows = numpy.arange(len(users))
+    rows, authors, _ = expand(following, users, rows, numpy.ones(len(rows)))
+    friend_rows, friends, friend_weights = expand(
+        following, authors, rows, numpy.full(len(rows), friend_weight)
+    )
+    degrees = numpy.minimum(
+        followers.indptr[authors + 1] - followers.indptr[authors],
+        max_neighbours
+    )
+    other_rows, others, other_weights = expand(
+        followers, authors, rows, cofollow_weight / degrees, max_neighbours
+    )
+    keep = others != users[other_rows]
+    co_rows, co_authors, co_weights = expand(
+        following, others[keep], other_rows[keep], other_weights[keep],
+        max_neighbours
+    )
+    keys = numpy.concatenate((friend_rows, co_rows)) * size + (
+        numpy.concatenate((friends, co_authors))
+    )
+    weights = numpy.concatenate((friend_weights, co_weights))
+    keys, inverse = numpy.unique(keys, return_inverse=True)
+    scores = numpy.round(
+        numpy.bincount(inverse, weights=weights), score_digits
+    )
+    known = numpy.concatenate((
+        rows * size + authors,
+        numpy.arange(len(users)) * size + users,
+    ))
+    fresh = ~numpy.isin(keys, known)
+    rows, candidates = numpy.divmod(keys[fresh], size)
+    scores = scores[fresh]
+    order = numpy.lexsort((candidates, -scores, rows))
+    rows, candidates, scores = rows[order], candidates[order], scores[order]
+    rank = numpy.arange(len(rows)) - numpy.searchsorted(rows, rows)
+    best = rank < top
+    rows, candidates, scores = rows[best], candidates[best], scores[best]
+    bounds = numpy.searchsorted(rows, numpy.arange(len(users) + 1))
+    for row, user in enumerate(users.tolist()):
+        start, stop = bounds[row], bounds[row + 1]
+        yield user, list(zip(
+            candidates[start:stop].tolist(), scores[start:stop].tolist()
+        ))
+
+
+def suggest_numpy(users, following, followers, top, batch=batch_users):
+    following = following.as_numpy()
+    followers = followers.as_numpy()
+    size = len(following.indptr) - 1
+    for start in range(0, len(users), batch):
+        yield from suggest_batch(
+            numpy.asarray(users[start:start + batch], dtype=id_typecode),
+            following, followers, size, top
+        )
+
+
+def build_suggestions(top=top_suggestions, use_numpy=None):
+    """
+    Пересчитывает таблицу FollowSuggestion целиком. По умолчанию пакеты
+    считаются в NumPy, если он установлен, иначе — циклом по массивам
+    array. Все рекомендации считаются до записи, вне транзакции, а
+    замена таблицы идёт одной короткой транзакцией: долгий расчёт не
+    держит блокировку записи SQLite, и читатели не видят пустую таблицу.
+    Возвращает число записанных рекомендаций.
+    """
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    ids, following, followers = load_graph()
+    users = range(len(ids))
+    suggest = suggest_numpy if use_numpy else suggest_python
+    # Готовые строки держатся в массивах: объекты моделей для всех
+    # пользователей разом заняли бы на порядок больше памяти.
+    user_ids = array(id_typecode)
+    author_ids = array(id_typecode)
+    scores = array('d')
+    for user, candidates in suggest(users, following, followers, top):
+        for candidate, score in candidates:
+            user_ids.append(ids[user])
+            author_ids.append(ids[candidate])
+            scores.append(score)
+    with transaction.atomic():
+        FollowSuggestion.objects.all().delete()
+        for start in range(0, len(scores), insert_batch):
+            stop = start + insert_batch
+            FollowSuggestion.objects.bulk_create([
+                FollowSuggestion(user_id=user, author_id=author, score=score)
+                for user, author, score in zip(
+                    user_ids[start:stop], author_ids[start:stop],
+                    scores[start:stop]
+                )
+            ])
+    return len(scores)
+
+
+def suggested_authors(user, exclude=None, limit=top_suggestions):
+    """
+    Готовые рекомендации одним запросом по индексу. Авторы, на которых
+    пользователь подписался после пересчёта, отсеиваются в том же запросе.
+    """
+    suggestions = FollowSuggestion.objects.filter(user=user).exclude(
+        author__following__user=user
+    )
+    if exclude is not None:
+        suggestions = suggestions.exclude(author=exclude)
+    return [
+        suggestion.author
+        for suggestion in suggestions.select_related('author')[:limit]
+    ]
@@ -0,0 +1,17 @@
+from django.core.files.storage import default_storage
+
+from core.tasks import task
+from .images import make_placeholder
+from .models import Post
+
+
+@task()
+def build_image_placeholder(post_id, image):
+    """Считает заглушку картинки поста вне запроса."""
+    if not default_storage.exists(image):
+        return
+    with default_storage.open(image) as image_file:
+        placeholder = make_placeholder(image_file)
+    Post.objects.filter(pk=post_id, image=image).update(
+        image_placeholder=placeholder
+    )
@@ -0,0 +1,107 @@
+from functools import lru_cache
+from urllib.parse import quote
+
+from django import template
+from django.urls import get_script_prefix, reverse
+from django.utils.formats import date_format
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.timezone import template_localtime
+
+from core.middleware.templates import timed
+from posts.images import resize_signature
+
+register = template.Library()
+
+slot: str = '9081726354'
+# Те же символы, что reverse() оставляет в пути без кодирования.
+url_safe: str = "!$&'()*+,;=/~:@"
+card_image_size: tuple = (960, 339)
+card_date_format: str = 'd E Y'
+links: dict = {
+    'detail': ('posts:post_detail', 'подробная информация'),
+    'profile': ('posts:profile', 'все посты пользователя'),
+    'group': ('posts:group_list', 'все записи группы'),
+}
+
+
+@lru_cache(maxsize=None)
+def url_parts(script_prefix, viewname, args):
+    """
+    URL view, разрезанный по подставляемым аргументам: reverse() один раз
+    строит адрес с метками slot вместо аргументов, дальше адрес
+    собирается склейкой строк.
+    """
+    return tuple(reverse(viewname, args=args).split(slot))
+
+
+def fast_reverse(viewname, *values):
+    """reverse() с позиционными аргументами по заранее разобранному URL."""
+    parts = url_parts(get_script_prefix(), viewname, (slot,) * len(values))
+    url = [parts[0]]
+    for value, part in zip(values, parts[1:]):
+        url.append(quote(str(value), safe=url_safe))
+        url.append(part)
+    return ''.join(url)
+
+
+def link_url(post, name):
+    viewname = links[name][0]
+    if name == 'detail':
+        return fast_reverse(viewname, post.pk)
+    if name == 'profile':
+        return fast_reverse(viewname, post.author.username)
+    return fast_reverse(viewname, post.group.slug)
+
+
+def image_html(post):
+    width, height = card_image_size
+    name = post.image.name
+    url = fast_reverse(
+        'posts:image_resize', resize_signature(name, width, height),
+        width, height, name
+    )
+    style = ''
+    if post.image_placeholder:
+        style = (
+            f' style="background: url({escape(post.image_placeholder)}) '
+            f'center / cover no-repeat"'
+        )
+    return (
+        f'<img class="card-img my-2" src="{escape(url)}" width="{width}" '
+        f'height="{height}" loading="lazy"{style}>\n'
+    )
+
+
+@register.simple_tag
+def post_card(post, *link_names):
+    """
+    Карточка поста в ленте со ссылками link_names: detail, profile,
+    group (ссылка на группу выводится, только если она есть). Карточка
+    собирается строками в Python: без include, без разбора {% url %}
+    и reverse() на каждый пост, поэтому страница ленты рендерится
+    в несколько раз быстрее. Вывод совпадает с прежним шаблоном
+    карточки с точностью до пробелов.
+    """
+    with timed('post_card'):
+        pub_date = date_format(
+            template_localtime(post.pub_date), card_date_format
+        )
+        html = [
+            '<article>\n<ul>\n'
+            f'<li>Автор: {escape(post.author.get_full_name())}</li>\n'
+            f'<li>Дата публикации: {pub_date}</li>\n'
+            '</ul>\n'
+        ]
+        if post.image:
+            html.append(image_html(post))
+        html.append(f'<p>{escape(post.text)}</p>\n')
+        for name in link_names:
+            if name == 'group' and not post.group_id:
+                continue
+            html.append(
+                '<a type="button" class="btn btn-outline-primary" '
+                f'href="{escape(link_url(post, name))}">{links[name][1]}</a>\n'
+            )
+        html.append('</article>')
+        return mark_safe(''.join(html))
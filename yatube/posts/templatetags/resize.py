@@ -0,0 +1,14 @@
+from django import template
+
+from core.middleware.templates import timed
+from posts.images import resized_url as build_resized_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def resized_url(image, geometry):
+    """URL уменьшенной копии картинки, geometry задаётся как '960x339'."""
+    with timed('resized_url'):
+        width, height = (int(side) for side in geometry.split('x'))
+        return build_resized_url(image.name, width, height)
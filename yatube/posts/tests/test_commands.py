@@ -0,0 +1,338 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipIf
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, models
+from django.test import LiveServerTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts.management.commands.benchmark import compare_results
+from posts.management.commands.loadtest import LatencyHistogram, LoadClient
+from posts import suggestions
+from posts.images import resize_cache_dir, source_version
+from posts.models import Comment, Follow, FollowSuggestion, Group, Post
+from posts.seeding import seed_dataset
+from posts.templatetags.cards import fast_reverse
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class CleanMediaCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Создание поста и файлов в MEDIA_ROOT для тестов clean_media."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            image='posts/used.gif'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        """Раскладываем используемый и осиротевший файлы."""
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'), exist_ok=True)
+        for name in ('used.gif', 'orphan.gif'):
+            with open(os.path.join(TEMP_MEDIA_ROOT, 'posts', name), 'wb'):
+                pass
+
+    def test_clean_media_removes_only_orphans(self):
+        """Команда удаляет только файлы, на которые не ссылается пост."""
+        call_command('clean_media', min_age=0, stdout=StringIO())
+        posts_dir = os.path.join(TEMP_MEDIA_ROOT, 'posts')
+        self.assertTrue(os.path.exists(os.path.join(posts_dir, 'used.gif')))
+        self.assertFalse(
+            os.path.exists(os.path.join(posts_dir, 'orphan.gif'))
+        )
+
+    def test_clean_media_ignores_database_collation(self):
+        """
+        Порядок имён из БД с collation без учёта регистра не приводит
+        к удалению используемых картинок.
+        """
+        Post.objects.create(
+            author=self.user, text='Пост', image='posts/B.gif'
+        )
+        Post.objects.create(
+            author=self.user, text='Пост', image='posts/a.gif'
+        )
+        for name in ('B.gif', 'a.gif', 'C-orphan.gif'):
+            with open(os.path.join(TEMP_MEDIA_ROOT, 'posts', name), 'wb'):
+                pass
+        names = sorted(
+            Post.objects.exclude(image='').values_list('image', flat=True),
+            key=str.lower
+        )
+        with mock.patch(
+            'posts.management.commands.clean_media.referenced_images',
+            return_value=iter(names)
+        ):
+            call_command('clean_media', min_age=0, stdout=StringIO())
+        left = os.listdir(os.path.join(TEMP_MEDIA_ROOT, 'posts'))
+        self.assertEqual(sorted(left), ['B.gif', 'a.gif', 'used.gif'])
+
+    def test_clean_media_removes_stale_resized_copies(self):
+        """Копии удалённых и заменённых картинок удаляются."""
+        copies = os.path.join(TEMP_MEDIA_ROOT, resize_cache_dir, 'posts')
+        current = f'{source_version("posts/used.gif")}_20x10.jpg'
+        layout = {
+            'used.gif': (current, '0000000000000000_20x10.jpg'),
+            'orphan.gif': (f'{source_version("posts/orphan.gif")}_20x10.jpg',),
+        }
+        for source, names in layout.items():
+            os.makedirs(os.path.join(copies, source), exist_ok=True)
+            for name in names:
+                with open(os.path.join(copies, source, name), 'wb'):
+                    pass
+        call_command('clean_media', min_age=0, stdout=StringIO())
+        self.assertEqual(
+            os.listdir(os.path.join(copies, 'used.gif')), [current]
+        )
+        self.assertEqual(os.listdir(os.path.join(copies, 'orphan.gif')), [])
+
+    def test_clean_media_keeps_fresh_files(self):
+        """Недавно загруженные файлы не удаляются."""
+        call_command('clean_media', stdout=StringIO())
+        self.assertTrue(os.path.exists(
+            os.path.join(TEMP_MEDIA_ROOT, 'posts', 'orphan.gif')
+        ))
+
+
+class SeedingTest(TestCase):
+    def test_seed_dataset_creates_requested_posts(self):
+        """Набор данных содержит нужное число постов и связей."""
+        created = seed_dataset(posts=200, seed=1)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(created['groups'], Group.objects.count())
+        self.assertEqual(created['comments'], Comment.objects.count())
+        self.assertEqual(created['follows'], Follow.objects.count())
+        self.assertFalse(
+            Follow.objects.filter(user=models.F('author')).exists()
+        )
+
+    def test_seed_dataset_resets_sequences(self):
+        """После набора данных обычная вставка получает свободный ключ."""
+        with mock.patch.object(
+            connection.ops, 'sequence_reset_sql',
+            wraps=connection.ops.sequence_reset_sql
+        ) as reset:
+            seed_dataset(posts=50, seed=1)
+        self.assertEqual(
+            set(reset.call_args[0][1]), {User, Group, Post}
+        )
+        last = Post.objects.aggregate(last=models.Max('pk'))['last']
+        post = Post.objects.create(
+            author=User.objects.first(), text='Пост после набора'
+        )
+        self.assertGreater(post.pk, last)
+
+    def test_seed_dataset_is_deterministic(self):
+        """Одинаковое зерно даёт одинаковых авторов и даты."""
+        layouts = []
+        for _ in range(2):
+            seed_dataset(posts=100, seed=7)
+            first_user = User.objects.aggregate(
+                first=models.Min('pk')
+            )['first']
+            layouts.append([
+                (author_id - first_user, pub_date)
+                for author_id, pub_date in Post.objects.order_by(
+                    'pk'
+                ).values_list('author_id', 'pub_date')
+            ] + sorted(Comment.objects.values_list('pub_date', flat=True))
+              + sorted(Follow.objects.values_list('pub_date', flat=True)))
+            Post.objects.all().delete()
+            User.objects.all().delete()
+        self.assertEqual(layouts[0], layouts[1])
+
+    def test_seeded_dates_follow_ids(self):
+        """Даты постов разнесены во времени и убывают вместе с id."""
+        seed_dataset(posts=200, seed=3)
+        dates = list(
+            Post.objects.order_by('pk').values_list('pub_date', flat=True)
+        )
+        self.assertEqual(dates, sorted(dates))
+        self.assertGreater(dates[-1] - dates[0], timedelta(hours=3))
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+    def test_seed_command_attaches_pool_images(self):
+        """Команда seed раздаёт постам картинки из пула с заглушками."""
+        out = StringIO()
+        call_command('seed', posts=50, images=True, stdout=out)
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.assertIn('posts: 50', out.getvalue())
+        with_images = Post.objects.exclude(image='')
+        self.assertTrue(with_images.exists())
+        self.assertFalse(with_images.filter(image_placeholder='').exists())
+
+
+class BenchmarkCompareTest(TestCase):
+    def test_compare_results_flags_regressions(self):
+        """Рост запросов и времени сверх порога считается регрессией."""
+        baseline = {'views': {'posts:index': {
+            'p50_ms': 10, 'p95_ms': 20, 'queries': 2, 'peak_kb': 100
+        }}}
+        current = {'views': {'posts:index': {
+            'p50_ms': 11, 'p95_ms': 30, 'queries': 3, 'peak_kb': 100
+        }}}
+        regressions = compare_results(baseline, current, threshold=0.25)
+        self.assertEqual(regressions, [
+            'posts:index: queries 2 -> 3',
+            'posts:index: p95_ms 20 -> 30',
+        ])
+
+
+class PostCardTest(TestCase):
+    def test_card_benchmark_matches_include(self):
+        """Тег карточки выводит то же, что include, и быстрее него."""
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            'card_benchmark', number=5, repeat=1, stdout=stdout,
+            stderr=stderr
+        )
+        self.assertEqual(stderr.getvalue(), '')
+        self.assertIn('Ускорение', stdout.getvalue())
+
+    def test_fast_reverse_matches_reverse(self):
+        """Адреса из разобранных URL совпадают с reverse()."""
+        cases = [
+            ('posts:profile', ('user.name+tag@mail',)),
+            ('posts:profile', ('юзер',)),
+            ('posts:group_list', ('test-slug',)),
+            ('posts:post_detail', (42,)),
+            ('posts:image_resize', ('abc', 960, 339, 'posts/a b&c.jpg')),
+        ]
+        for viewname, args in cases:
+            with self.subTest(viewname=viewname, args=args):
+                self.assertEqual(
+                    fast_reverse(viewname, *args), reverse(viewname, args=args)
+                )
+
+
+class FollowSuggestionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Граф подписок: a -> b -> c, d читает b, c и e."""
+        super().setUpClass()
+        cls.users = {
+            name: User.objects.create_user(username=name)
+            for name in 'abcde'
+        }
+        for user, author in ('ab', 'bc', 'db', 'dc', 'de'):
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author]
+            )
+
+    def suggested(self, name):
+        return list(FollowSuggestion.objects.filter(
+            user=self.users[name]
+        ).values_list('author__username', flat=True))
+
+    def test_build_suggestions_command(self):
+        """Рекомендации — друзья друзей и авторы, которых читают вместе."""
+        out = StringIO()
+        call_command('build_suggestions', no_numpy=True, stdout=out)
+        self.assertIn('Рекомендаций', out.getvalue())
+        self.assertEqual(self.suggested('a'), ['c', 'e'])
+        self.assertNotIn('a', self.suggested('b'))
+
+    @skipIf(suggestions.numpy is None, 'NumPy не установлен')
+    def test_numpy_matches_python(self):
+        """Пакетный расчёт в NumPy даёт те же рекомендации."""
+        ids, following, followers = suggestions.load_graph()
+        users = range(len(ids))
+        self.assertEqual(
+            list(suggestions.suggest_numpy(users, following, followers, 5)),
+            list(suggestions.suggest_python(users, following, followers, 5))
+        )
+
+    def test_suggestions_computed_outside_transaction(self):
+        """Расчёт идёт до транзакции, которая заменяет таблицу."""
+        depth = len(connection.savepoint_ids)
+        depths = []
+        suggest = suggestions.suggest_python
+
+        def spy(*args):
+            for item in suggest(*args):
+                depths.append(len(connection.savepoint_ids))
+                yield item
+        with mock.patch.object(suggestions, 'suggest_python', spy):
+            total = suggestions.build_suggestions(use_numpy=False)
+        self.assertEqual(set(depths), {depth})
+        self.assertEqual(total, FollowSuggestion.objects.count())
+
+    def test_followed_authors_are_not_suggested(self):
+        """Подписка после пересчёта убирает автора из рекомендаций."""
+        suggestions.build_suggestions(use_numpy=False)
+        user = self.users['a']
+        self.client.force_login(user)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [author.username for author in response.context['suggestions']],
+            ['c', 'e']
+        )
+        Follow.objects.create(user=user, author=self.users['c'])
+        response = self.client.get(
+            reverse('posts:profile', args={'b'})
+        )
+        self.assertEqual(
+            [author.username for author in response.context['suggestions']],
+            ['e']
+        )
+
+
+class LatencyHistogramTest(TestCase):
+    def test_percentiles_within_bucket_precision(self):
+        """Перцентили гистограммы отличаются от точных меньше чем на 1%."""
+        histogram = LatencyHistogram()
+        for millisecond in range(1, 1001):
+            histogram.record(millisecond / 1000)
+        self.assertEqual(histogram.total, 1000)
+        for percent, exact in ((50, 500), (99, 990), (100, 1000)):
+            self.assertAlmostEqual(
+                histogram.percentile(percent), exact, delta=exact * 0.01
+            )
+
+
+class LoadClientTest(TestCase):
+    def test_unfollow_requests_keep_their_own_name(self):
+        """Отписки учитываются под своим именем URL, а не под подпиской."""
+        client = LoadClient(
+            None, {'authors': ['author']}, {'posts:profile_follow': 1},
+            None, seed=1, deadline=0
+        )
+        names = set()
+        for _ in range(20):
+            name, _, path, _ = client.next_request('posts:profile_follow')
+            self.assertEqual(path, reverse(name, args=['author']))
+            names.add(name)
+        self.assertEqual(
+            names, {'posts:profile_follow', 'posts:profile_unfollow'}
+        )
+
+
+class LoadTestCommandTest(LiveServerTestCase):
+    def test_loadtest_reports_every_url_name(self):
+        """Команда гоняет смесь запросов и печатает сводку по URL."""
+        seed_dataset(posts=50, seed=3)
+        out = StringIO()
+        call_command(
+            'loadtest', url=self.live_server_url, concurrency=2,
+            duration=1, stdout=out
+        )
+        report = out.getvalue()
+        self.assertIn('posts:post_detail', report)
+        self.assertIn('posts:follow_index', report)
@@ -1,5 +1,6 @@
 import shutil
 import tempfile
+from http import HTTPStatus
 from xml.etree.ElementTree import Comment
 
 from django.test import Client, TestCase, override_settings
@@ -7,12 +8,14 @@ from django.urls import reverse
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 
 from posts.models import Group, Post, Comment
 
 User = get_user_model()
 count_new_posts: int = 1
 count_new_comments: int = 1
+placeholder_max_length: int = 1024
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
@@ -87,6 +90,80 @@ class PostFormTest(TestCase):
             ).exists()
         )
 
+    def test_post_create_saves_image_placeholder(self):
+        """При загрузке картинки у поста сохраняется размытая заглушка."""
+        small_5_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        uploaded = SimpleUploadedFile(
+            name='small_5.gif',
+            content=small_5_gif,
+            content_type='image/gif'
+        )
+        form_data = {
+            'text': 'Тестовый текст с заглушкой',
+            'image': uploaded,
+        }
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data=form_data,
+            follow=True
+        )
+        call_command('run_worker', once=True)
+        post = Post.objects.get(text='Тестовый текст с заглушкой')
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+        self.assertLess(len(post.image_placeholder), placeholder_max_length)
+
+    @override_settings(FILE_UPLOAD_MAX_SIZE=16)
+    def test_post_create_rejects_oversized_upload(self):
+        """Слишком большой файл обрывает загрузку до создания поста."""
+        posts_count = Post.objects.count()
+        uploaded = SimpleUploadedFile(
+            name='big.gif',
+            content=b'\x00' * 1024,
+            content_type='image/gif'
+        )
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Тестовый текст', 'image': uploaded}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(Post.objects.count(), posts_count)
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1)
+    def test_post_create_rejects_too_many_pixels(self):
+        """Картинка с большим разрешением не проходит валидацию формы."""
+        posts_count = Post.objects.count()
+        small_6_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        uploaded = SimpleUploadedFile(
+            name='small_6.gif',
+            content=small_6_gif,
+            content_type='image/gif'
+        )
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Тестовый текст', 'image': uploaded}
+        )
+        self.assertFormError(
+            response, 'form', 'image',
+            'Слишком большое разрешение: 2x1'
+        )
+        self.assertEqual(Post.objects.count(), posts_count)
+
     def test_post_create_for_anonymous(self):
         """
         Валидная форма не создает запись в Post и верно перенаправляет
@@ -1,7 +1,13 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
 
-from posts.models import Group, Post, Comment, Follow
+from posts import follow_graph as graph_module
+from posts.follow_graph import FollowGraph, follow_graph
+from posts.models import Group, Post, Comment, Follow, FollowChange
 
 User = get_user_model()
 quantity_letters: int = 15
@@ -48,3 +54,110 @@ class PostModelTest(TestCase):
         for model, expected_value in models_str.items():
             with self.subTest(model=model):
                 self.assertEqual(str(model), expected_value)
+
+
+class FollowGraphTest(TestCase):
+    def test_graph_queries(self):
+        """Граф отвечает на вопросы о подписках по массивам в памяти."""
+        graph = FollowGraph([(1, 2), (2, 1), (1, 3), (3, 4), (4, 3)], 0)
+        self.assertTrue(graph.is_following(1, 3))
+        self.assertFalse(graph.is_following(3, 1))
+        self.assertFalse(graph.is_following(5, 1))
+        self.assertEqual(graph.following_count(1), 2)
+        self.assertEqual(graph.follower_count(3), 2)
+        self.assertTrue(graph.is_mutual(3, 4))
+        self.assertFalse(graph.is_mutual(1, 3))
+        self.assertEqual(graph.mutual(1), [2])
+
+    def test_add_and_remove_are_idempotent(self):
+        """Повторное добавление и удаление подписки не портит массивы."""
+        graph = FollowGraph([], 0)
+        for _ in range(2):
+            graph.add(1, 3)
+            graph.add(1, 2)
+        self.assertEqual(list(graph.following_ids(1)), [2, 3])
+        for _ in range(2):
+            graph.remove(1, 3)
+        self.assertEqual(list(graph.following_ids(1)), [2])
+        self.assertEqual(graph.follower_count(3), 0)
+
+
+class FollowGraphCacheTest(TransactionTestCase):
+    def setUp(self):
+        graph_module._graph = None
+        self.addCleanup(setattr, graph_module, '_graph', None)
+        self.user = User.objects.create_user(username='user')
+        self.author = User.objects.create_user(username='author')
+
+    def test_graph_updated_in_place_on_commit(self):
+        """Изменения подписок этого процесса не требуют запросов графа."""
+        # Журнал не пуст: по нему граф знает, какой id ждать следующим.
+        Follow.objects.create(user=self.author, author=self.user)
+        with self.assertNumQueries(2):
+            follow_graph()
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follow_graph().is_following(self.user.id, self.author.id)
+            )
+        follow.delete()
+        with self.assertNumQueries(0):
+            self.assertFalse(
+                follow_graph().is_following(self.user.id, self.author.id)
+            )
+
+    def test_rolled_back_follow_is_not_recorded(self):
+        """Откаченная подписка не попадает ни в журнал, ни в граф."""
+        follow_graph()
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Follow.objects.create(user=self.user, author=self.author)
+                raise RuntimeError
+        self.assertFalse(FollowChange.objects.exists())
+        self.assertFalse(
+            follow_graph().is_following(self.user.id, self.author.id)
+        )
+
+    def test_profile_sees_follow_from_other_process(self):
+        """Кнопка подписки не ждёт, пока граф процесса догонит журнал."""
+        follow_graph()
+        Follow.objects.bulk_create([
+            Follow(user=self.user, author=self.author)
+        ])
+        FollowChange.objects.create(
+            user_id=self.user.id, author_id=self.author.id
+        )
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertTrue(response.context['following'])
+
+    @mock.patch.object(graph_module, 'sync_interval', 0)
+    def test_graph_catches_up_with_other_processes(self):
+        """Подписка из другого процесса применяется из журнала."""
+        graph = follow_graph()
+        Follow.objects.bulk_create([
+            Follow(user=self.user, author=self.author)
+        ])
+        FollowChange.objects.create(
+            user_id=self.user.id, author_id=self.author.id
+        )
+        with self.assertNumQueries(1):
+            self.assertTrue(
+                follow_graph().is_following(self.user.id, self.author.id)
+            )
+        self.assertIs(follow_graph(), graph)
+
+    @mock.patch.object(graph_module, 'sync_interval', 0)
+    def test_reset_reloads_graph(self):
+        """Запись о сбросе в журнале перезагружает граф целиком."""
+        graph = follow_graph()
+        Follow.objects.bulk_create([
+            Follow(user=self.user, author=self.author)
+        ])
+        FollowChange.objects.create(user_id=None, author_id=None)
+        self.assertIsNot(follow_graph(), graph)
+        self.assertTrue(
+            follow_graph().is_following(self.user.id, self.author.id)
+        )
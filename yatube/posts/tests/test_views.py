@@ -1,14 +1,26 @@
+import os
 import shutil
 import tempfile
+import threading
+import time
+from http import HTTPStatus
+from io import BytesIO
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client, override_settings
+from django.db import transaction
+from django.test import (
+    TestCase, Client, TransactionTestCase, override_settings
+)
 from django.urls import reverse
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django import forms
+from PIL import Image
 
+from posts.feeds import bump_feed_version
+from posts.images import resized_url
 from posts.models import Post, Group, Comment, Follow
 
 
@@ -431,6 +443,41 @@ class PostViewsTest(TestCase):
         posts_new = response.context['page_obj']
         self.assertNotIn(post, posts_new)
 
+    def test_image_resize_returns_cached_copy(self):
+        """Подписанный URL отдаёт уменьшенную копию с коротким кэшем."""
+        url = resized_url(PostViewsTest.post_1.image.name, 20, 10)
+        response = self.guest_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=600', response['Cache-Control'])
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as im:
+            self.assertEqual(im.size, (20, 10))
+
+    def test_image_resize_revalidates_by_etag(self):
+        """Копия перепроверяется по ETag и меняется вместе с исходником."""
+        name = PostViewsTest.post_1.image.name
+        url = resized_url(name, 20, 10)
+        etag = self.guest_client.get(url)['ETag']
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        source = os.path.join(settings.MEDIA_ROOT, name)
+        stat = os.stat(source)
+        os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_image_resize_rejects_bad_signature(self):
+        """URL с чужой подписью не обрабатывается."""
+        response = self.guest_client.get(reverse('posts:image_resize', kwargs={
+            'signature': 'bad',
+            'width': 20,
+            'height': 10,
+            'name': PostViewsTest.post_1.image.name,
+        }))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -594,3 +641,370 @@ class CacheViewsTest(TestCase):
         cache.clear()
         response = self.guest_client.get(reverse('posts:index'))
         self.assertNotEqual(response.content, content_old)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True, MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class QueryBudgetViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Создание записей в БД для тестов бюджета запросов."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(count_posts):
+            post = Post.objects.create(
+                text=f'Тестовый пост № {i}',
+                author=(cls.author, cls.reader)[i % 2],
+                group=cls.group
+            )
+            Comment.objects.create(
+                post=post, author=cls.author, text='Комментарий'
+            )
+            Comment.objects.create(
+                post=post, author=cls.reader, text='Комментарий'
+            )
+        cls.post = post
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(QueryBudgetViewsTest.reader)
+        cache.clear()
+
+    def test_read_views_stay_within_budget(self):
+        """Страницы укладываются в бюджет и не повторяют SQL."""
+        post = QueryBudgetViewsTest.post
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args={self.group.slug}),
+            reverse('posts:profile', args={self.author.username}),
+            reverse('posts:post_detail', args={post.id}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_create'),
+            reverse('posts:post_edit', args={post.id}),
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args={self.group.slug}),
+            reverse('posts:api_profile', args={self.author.username}),
+            reverse('posts:api_post_detail', args={post.id}),
+            reverse('posts:api_follow_index'),
+            reverse('posts:index') + '?fragment=1',
+            reverse('posts:profile', args={self.author.username})
+            + '?fragment=1',
+        ]
+        for client in (self.guest_client, self.authorized_client):
+            for url in urls:
+                with self.subTest(url=url):
+                    cache.clear()
+                    client.get(url)
+
+    def test_write_views_stay_within_budget(self):
+        """Изменяющие view укладываются в бюджет и не повторяют SQL."""
+        post = QueryBudgetViewsTest.post
+        client = self.authorized_client
+        client.post(reverse('posts:post_create'), data={
+            'text': 'Новый пост', 'group': self.group.id
+        })
+        client.post(reverse('posts:post_edit', args={post.id}), data={
+            'text': 'Изменённый пост', 'group': self.group.id
+        })
+        client.post(reverse('posts:add_comment', args={post.id}), data={
+            'text': 'Новый комментарий'
+        })
+        client.get(reverse('posts:profile_unfollow', args={'author'}))
+        client.get(reverse('posts:profile_follow', args={'author'}))
+
+
+class StreamingFeedViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Создание записей в БД для тестов потокового рендера лент."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(count_posts):
+            Post.objects.create(
+                text=f'Тестовый пост № {i}',
+                author=cls.author,
+                group=cls.group
+            )
+        Follow.objects.create(
+            user=User.objects.create_user(username='reader'),
+            author=cls.author
+        )
+
+    def setUp(self):
+        self.client.force_login(User.objects.get(username='reader'))
+
+    def test_streamed_feeds_match_buffered_render(self):
+        """Потоковый рендер лент даёт тот же HTML, что и обычный."""
+        urls = [
+            reverse('posts:group_list', args={self.group.slug}),
+            reverse('posts:profile', args={self.author.username}),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                buffered = self.client.get(url)
+                with self.settings(STREAM_FEEDS=True):
+                    streamed = self.client.get(url)
+                self.assertTrue(streamed.streaming)
+                self.assertEqual(
+                    b''.join(streamed.streaming_content), buffered.content
+                )
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class ApiViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Создание записей в БД для тестов JSON API."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(count_posts):
+            cls.post = Post.objects.create(
+                text=f'Тестовый пост № {i}',
+                author=cls.author,
+                group=cls.group
+            )
+        Comment.objects.create(
+            post=cls.post, author=cls.author, text='Комментарий'
+        )
+        Follow.objects.create(
+            user=User.objects.create_user(username='reader'),
+            author=cls.author
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(
+            User.objects.get(username='reader')
+        )
+
+    def test_feeds_walk_by_cursor(self):
+        """Ленты API отдают все посты по курсору без повторов."""
+        urls = [
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args={self.group.slug}),
+            reverse('posts:api_profile', args={self.author.username}),
+            reverse('posts:api_follow_index'),
+        ]
+        expected = list(Post.objects.values_list('id', flat=True))
+        for url in urls:
+            with self.subTest(url=url):
+                ids = []
+                params = {'limit': 5}
+                while True:
+                    data = self.authorized_client.get(url, params).json()
+                    ids += [item['id'] for item in data['results']]
+                    if data['next'] is None:
+                        break
+                    params['cursor'] = data['next']
+                self.assertEqual(ids, expected)
+
+    def test_fields_selection(self):
+        """Параметр fields оставляет в ответе только выбранные поля."""
+        response = self.client.get(
+            reverse('posts:api_index'), {'fields': 'id,author'}
+        )
+        item = response.json()['results'][0]
+        self.assertEqual(item, {'id': self.post.id, 'author': 'author'})
+
+    def test_errors(self):
+        """Ошибки API приходят в JSON с подходящим кодом."""
+        cases = {
+            reverse('posts:api_index') + '?fields=password':
+                HTTPStatus.BAD_REQUEST,
+            reverse('posts:api_index') + '?cursor=bad':
+                HTTPStatus.BAD_REQUEST,
+            reverse('posts:api_group_list', args={'missing'}):
+                HTTPStatus.NOT_FOUND,
+            reverse('posts:api_follow_index'): HTTPStatus.UNAUTHORIZED,
+        }
+        for url, status in cases.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('error', response.json())
+
+    def test_post_detail_includes_comments(self):
+        """Пост в API отдаётся вместе с комментариями."""
+        response = self.client.get(
+            reverse('posts:api_post_detail', args={self.post.id})
+        )
+        data = response.json()
+        self.assertEqual(data['text'], self.post.text)
+        self.assertEqual(data['group'], self.group.slug)
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            ['Комментарий']
+        )
+
+    def test_payload_smaller_than_html(self):
+        """Лента в JSON заметно меньше той же страницы в HTML."""
+        cache.clear()
+        html = self.client.get(reverse('posts:index'))
+        data = self.client.get(reverse('posts:api_index'))
+        self.assertLess(len(data.content) * 2, len(html.content))
+
+
+class FragmentViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Создание записей в БД для тестов подгрузки ленты."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(count_posts):
+            Post.objects.create(
+                text=f'Тестовый пост № {i}',
+                author=cls.author,
+                group=cls.group
+            )
+        Follow.objects.create(
+            user=User.objects.create_user(username='reader'),
+            author=cls.author
+        )
+
+    def setUp(self):
+        self.client.force_login(User.objects.get(username='reader'))
+        cache.clear()
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args={self.group.slug}),
+            reverse('posts:profile', args={self.author.username}),
+            reverse('posts:follow_index'),
+        ]
+
+    def test_fragment_contains_only_post_cards(self):
+        """Фрагмент ленты — только карточки постов, без каркаса страницы."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                page = self.client.get(url).content.decode()
+                response = self.client.get(url, {'fragment': 1})
+                fragment = response.content.decode()
+                self.assertEqual(
+                    fragment.count('<article>'), posts_on_first_page
+                )
+                self.assertNotIn('<html', fragment)
+                self.assertNotIn('<footer', fragment)
+                self.assertLess(len(fragment), len(page))
+                self.assertTrue(response.has_header('X-Next-Cursor'))
+
+    def test_fragments_walk_by_cursor(self):
+        """Порции по курсору продолжают ленту до конца без повторов."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, {'fragment': 1})
+                first = response.content.decode().count('<article>')
+                response = self.client.get(url, {
+                    'fragment': 1, 'cursor': response['X-Next-Cursor']
+                })
+                self.assertEqual(
+                    response.content.decode().count('<article>'),
+                    posts_on_second_page
+                )
+                self.assertFalse(response.has_header('X-Next-Cursor'))
+                self.assertEqual(first + posts_on_second_page, count_posts)
+
+    def test_fragment_continues_numbered_page(self):
+        """Фрагмент со страницы page совпадает с постами этой страницы."""
+        url = reverse('posts:profile', args={self.author.username})
+        page = self.client.get(url, {'page': 2})
+        fragment = self.client.get(url, {'fragment': 1, 'page': 2})
+        for post in page.context['page_obj']:
+            self.assertIn(post.text, fragment.content.decode())
+        self.assertEqual(
+            fragment.content.decode().count('<article>'), posts_on_second_page
+        )
+
+    def test_bad_cursor(self):
+        """Испорченный курсор даёт 400."""
+        response = self.client.get(
+            reverse('posts:index'), {'fragment': 1, 'cursor': 'bad'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+class FeedVersionViewTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.url = reverse('posts:feed_version')
+
+    def test_new_posts_counted(self):
+        """Версия — id последнего поста, новые посты считаются с since."""
+        since = self.client.get(self.url).json()['version']
+        for number in range(2):
+            post = Post.objects.create(
+                author=self.author, text=f'Пост {number}'
+            )
+        post.text = 'Изменённый пост'
+        post.save()
+        data = self.client.get(self.url, {'since': since}).json()
+        self.assertEqual(data, {'version': post.pk, 'new': 2})
+        with self.assertNumQueries(0):
+            data = self.client.get(self.url, {'since': post.pk}).json()
+        self.assertEqual(data, {'version': post.pk, 'new': 0})
+
+    def test_version_not_bumped_before_commit(self):
+        """Откаченный пост не меняет версию ленты."""
+        since = self.client.get(self.url).json()['version']
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Post.objects.create(author=self.author, text='Откат')
+                raise RuntimeError
+        self.assertEqual(self.client.get(self.url).json()['version'], since)
+
+    def test_posts_from_other_processes_are_seen(self):
+        """Пост, записанный в обход этого процесса, виден после интервала."""
+        since = self.client.get(self.url).json()['version']
+        Post.objects.bulk_create([Post(author=self.author, text='Чужой пост')])
+        with mock.patch('posts.feeds.version_poll_interval', 0.05):
+            cache.clear()
+            self.client.get(self.url)
+            data = self.client.get(
+                self.url, {'since': since, 'wait': 5}
+            ).json()
+        self.assertEqual(data['new'], 1)
+
+    def test_long_poll_wakes_on_new_post(self):
+        """Ожидание заканчивается, как только появляется новый пост."""
+        since = self.client.get(self.url).json()['version']
+        timer = threading.Timer(0.05, bump_feed_version)
+        timer.start()
+        self.addCleanup(timer.cancel)
+        Post.objects.bulk_create([Post(author=self.author, text='Пост')])
+        started = time.monotonic()
+        data = self.client.get(self.url, {'since': since, 'wait': 10}).json()
+        self.assertLess(time.monotonic() - started, 0.9)
+        self.assertEqual(data['new'], 1)
+
+    def test_long_poll_times_out(self):
+        """Без новых постов ожидание заканчивается по таймауту."""
+        since = self.client.get(self.url).json()['version']
+        data = self.client.get(self.url, {'since': since, 'wait': 0.05})
+        self.assertEqual(data.json()['new'], 0)
+
+    def test_bad_parameters(self):
+        """Нечисловые since и wait дают 400."""
+        response = self.client.get(self.url, {'since': 'x'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
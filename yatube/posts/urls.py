@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
@@ -25,4 +25,17 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path(
+        'media/resize/<str:signature>/<int:width>x<int:height>/<path:name>',
+        views.image_resize,
+        name='image_resize'
+    ),
+    path('feed/version/', api.version, name='feed_version'),
+    path('api/posts/', api.index, name='api_index'),
+    path('api/group/<slug:slug>/', api.group_posts, name='api_group_list'),
+    path('api/profile/<str:username>/', api.profile, name='api_profile'),
+    path('api/follow/', api.follow_index, name='api_follow_index'),
+    path(
+        'api/posts/<int:post_id>/', api.post_detail, name='api_post_detail'
+    ),
 ]
@@ -1,71 +1,109 @@
+from django.core.exceptions import SuspiciousFileOperation
 from django.core.paginator import Paginator
+from django.http import Http404
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
 from django.views.decorators.cache import cache_page
 
+from core.media import serve_file
+from core.middleware.compression import precompressed
+from core.streaming import render_streaming
+from core.middleware.queries import query_budget
+
+from .feeds import render_fragment
 from .models import Post, Group, User, Follow
+from .suggestions import suggested_authors
 
 from .forms import PostForm, CommentForm
+from .images import get_resized, resize_max_side, resize_signature
 
 quantity_posts: int = 10
+# URL копии не меняется, если под тем же именем загрузят другую картинку,
+# поэтому кэш короткий, а дальше браузер перепроверяет копию по ETag.
+resized_max_age: int = 10 * 60
 
 
 @cache_page(20, key_prefix='index_page')
+@precompressed
+@query_budget(5)
 def index(request):
     template_index = 'posts/index.html'
-    posts_index = Post.objects.all()
+    posts_index = Post.objects.select_related('author', 'group')
+    if request.GET.get('fragment'):
+        return render_fragment(
+            request, template_index, posts_index, {}, quantity_posts
+        )
     paginator_index = Paginator(posts_index, quantity_posts)
     page_number_index = request.GET.get('page')
     page_obj_index = paginator_index.get_page(page_number_index)
     context_index = {
-        'posts': posts_index,
         'page_obj': page_obj_index,
     }
     return render(request, template_index, context_index)
 
 
+@query_budget(6)
 def group_posts(request, slug):
     template_group = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts_group = group.posts.all()
+    posts_group = group.posts.select_related('author')
+    if request.GET.get('fragment'):
+        return render_fragment(
+            request, template_group, posts_group, {'group': group},
+            quantity_posts
+        )
     paginator_group = Paginator(posts_group, quantity_posts)
     page_number_group = request.GET.get('page')
     page_obj_group = paginator_group.get_page(page_number_group)
     context_group = {
         'group': group,
-        'posts': posts_group,
         'page_obj': page_obj_group,
     }
-    return render(request, template_group, context_group)
+    return render_streaming(request, template_group, context_group)
 
 
+@query_budget(8)
 def profile(request, username):
     template_profile = 'posts/profile.html'
     profile = get_object_or_404(User, username=username)
-    posts_profile = profile.posts_for_author.all()
+    posts_profile = profile.posts_for_author.select_related('group')
+    if request.GET.get('fragment'):
+        return render_fragment(
+            request, template_profile, posts_profile, {'profile': profile},
+            quantity_posts
+        )
     paginator_profile = Paginator(posts_profile, quantity_posts)
     page_number_profile = request.GET.get('page')
     page_obj_profile = paginator_profile.get_page(page_number_profile)
     following = False
+    suggestions = []
     if request.user.is_authenticated:
+        # Кнопку подписки решает точная проверка по базе: граф процесса
+        # может отставать, а после редиректа запрос придёт к другому
+        # воркеру.
         following = Follow.objects.filter(
-            user=request.user,
-            author=profile
+            user=request.user, author=profile
         ).exists()
+        suggestions = suggested_authors(request.user, exclude=profile)
     context_profile = {
         'profile': profile,
-        'posts': posts_profile,
         'page_obj': page_obj_profile,
-        'following': following
+        'following': following,
+        'suggestions': suggestions,
     }
-    return render(request, template_profile, context_profile)
+    return render_streaming(request, template_profile, context_profile)
 
 
+@query_budget(6)
 def post_detail(request, post_id):
     template_post_detail = 'posts/post_detail.html'
-    post_for_id = Post.objects.get(id=post_id)
+    post_for_id = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id
+    )
     form_comment = CommentForm()
-    comments_post = post_for_id.comments.all()
+    comments_post = post_for_id.comments.select_related('author')
     context_post_detail = {
         'posts': post_for_id,
         'form': form_comment,
@@ -75,6 +113,7 @@ def post_detail(request, post_id):
 
 
 @login_required
+@query_budget(8)
 def post_create(request):
     template_post_create = 'posts/create_post.html'
     template_successful = 'posts:profile'
@@ -97,11 +136,12 @@ def post_create(request):
 
 
 @login_required
+@query_budget(8)
 def post_edit(request, post_id):
     template_post_edit = 'posts/create_post.html'
     template_successful = 'posts:post_detail'
     post_for_id = get_object_or_404(Post, id=post_id)
-    if request.user != post_for_id.author:
+    if request.user.id != post_for_id.author_id:
         return redirect(template_successful, post_id=post_id)
     form_post_edit = PostForm(
         request.POST or None,
@@ -124,6 +164,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@query_budget(7)
 def add_comment(request, post_id):
     template_add_comment = 'posts:post_detail'
     post_for_id = get_object_or_404(Post, id=post_id)
@@ -137,20 +178,28 @@ def add_comment(request, post_id):
 
 
 @login_required
+@query_budget(6)
 def follow_index(request):
     template_follow_index = 'posts/follow.html'
-    follow_posts = Post.objects.filter(author__following__user=request.user)
+    follow_posts = Post.objects.filter(
+        author__following__user=request.user
+    ).select_related('author', 'group')
+    if request.GET.get('fragment'):
+        return render_fragment(
+            request, template_follow_index, follow_posts, {}, quantity_posts
+        )
     paginator_follow = Paginator(follow_posts, quantity_posts)
     page_number_follow = request.GET.get('page')
     page_obj_follow = paginator_follow.get_page(page_number_follow)
     context = {
-        'posts': follow_posts,
         'page_obj': page_obj_follow,
+        'suggestions': suggested_authors(request.user),
     }
-    return render(request, template_follow_index, context)
+    return render_streaming(request, template_follow_index, context)
 
 
 @login_required
+@query_budget(8)
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
@@ -165,6 +214,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@query_budget(6)
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     following_user = Follow.objects.filter(
@@ -173,3 +223,23 @@ def profile_unfollow(request, username):
     )
     following_user.delete()
     return redirect('posts:profile', username=username)
+
+
+@query_budget(0)
+def image_resize(request, signature, width, height, name):
+    from PIL import Image
+
+    expected = resize_signature(name, width, height)
+    if not constant_time_compare(signature, expected):
+        raise Http404('Неверная подпись')
+    if not (0 < width <= resize_max_side and 0 < height <= resize_max_side):
+        raise Http404('Недопустимый размер')
+    try:
+        path = get_resized(name, width, height)
+    except (OSError, SuspiciousFileOperation, Image.DecompressionBombError):
+        raise Http404('Картинка не найдена')
+    response = serve_file(request, path, content_type='image/jpeg')
+    patch_cache_control(
+        response, public=True, max_age=resized_max_age
+    )
+    return response
@@ -1,5 +1,8 @@
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
 from django.contrib.auth import get_user_model
+from django.template import loader
+
+from core.tasks import enqueue
 
 
 User = get_user_model()
@@ -9,3 +12,23 @@ class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email,
+                  html_email_template_name=None):
+        """Рендерит письмо в запросе, а отправку ставит в очередь."""
+        subject = loader.render_to_string(subject_template_name, context)
+        subject = ''.join(subject.splitlines())
+        html = ''
+        if html_email_template_name is not None:
+            html = loader.render_to_string(html_email_template_name, context)
+        enqueue(
+            'users.tasks.send_emails',
+            subject=subject,
+            body=loader.render_to_string(email_template_name, context),
+            from_email=from_email,
+            to=[to_email],
+            html=html
+        )
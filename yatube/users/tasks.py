@@ -0,0 +1,20 @@
+from django.core.mail import EmailMultiAlternatives, get_connection
+
+from core.tasks import task
+
+
+@task(batch=True)
+def send_emails(messages):
+    """Отправляет накопившиеся письма через одно соединение."""
+    emails = []
+    for message in messages:
+        email = EmailMultiAlternatives(
+            message['subject'],
+            message['body'],
+            message['from_email'],
+            message['to']
+        )
+        if message['html']:
+            email.attach_alternative(message['html'], 'text/html')
+        emails.append(email)
+    get_connection().send_messages(emails)
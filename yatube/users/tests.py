@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.models import Task
+
+User = get_user_model()
+
+
+class PasswordResetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Создание пользователя с почтой для сброса пароля."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='auth', email='auth@example.com', password='pass12345'
+        )
+
+    def test_password_reset_mail_is_queued(self):
+        """Письмо сброса пароля уходит через фоновую очередь."""
+        response = Client().post(
+            reverse('users:password_reset'),
+            data={'email': PasswordResetTest.user.email}
+        )
+        self.assertRedirects(response, reverse('users:password_reset_done'))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertTrue(
+            Task.objects.filter(name='users.tasks.send_emails').exists()
+        )
+        call_command('run_worker', once=True)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['auth@example.com'])
@@ -50,6 +50,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.metrics.MetricsMiddleware',
+    'core.middleware.memory.MemoryProfilerMiddleware',
+    'core.middleware.queries.QueryBudgetMiddleware',
+    'core.middleware.templates.TemplateTimingMiddleware',
+    'core.middleware.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,8 +62,84 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.profiling.ProfilerMiddleware',
 ]
 
+# Per-request SQL accounting, see core.middleware.queries.
+QUERY_BUDGET_HEADERS = DEBUG
+QUERY_BUDGET_STRICT = False
+
+# Statements slower than this many seconds go to SLOW_QUERY_LOG with
+# their EXPLAIN plan; None disables. Report: `manage.py slow_queries`.
+SLOW_QUERY_THRESHOLD = 0.1
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'slow_queries.log')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'formatter': 'message',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'core.middleware.queries.slow': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+# Stream group, profile and follow feeds: the page head is sent before
+# post cards are rendered, see core.streaming. Off by default because
+# the test client has no response.context for streaming responses.
+STREAM_FEEDS = False
+
+# Build the URL resolver and compile these templates in
+# CoreConfig.ready() instead of on the first request, see core.startup.
+STARTUP_PRELOAD = not DEBUG
+STARTUP_PRELOAD_TEMPLATES = [
+    'base.html',
+    'posts/index.html',
+    'posts/group_list.html',
+    'posts/profile.html',
+    'posts/post_detail.html',
+    'posts/follow.html',
+    'includes/paginator.html',
+]
+
+# Per-template render timing, see core.middleware.templates. Off by default:
+# it replaces the template loaders with the instrumented core.loaders.Loader.
+TEMPLATE_TIMING = False
+TEMPLATE_TIMING_HEADERS = DEBUG
+
+# Opt-in tracemalloc peak and allocation sites per request, see
+# core.middleware.memory. Bytes; views can override with @memory_budget.
+MEMORY_PROFILING = False
+MEMORY_BUDGET = 20 * 1024 * 1024
+
+# Staff can profile a single request with ?_profile=cprofile|sample,
+# see core.middleware.profiling. False removes the middleware entirely.
+PROFILER_ENABLED = True
+PROFILER_DIR = os.path.join(BASE_DIR, 'profiles')
+
+# Prometheus metrics at /metrics, see core.metrics. With several worker
+# processes point METRICS_DIR at a directory shared by them and empty it
+# on deploy; empty METRICS_DIR keeps metrics in the process only.
+# Prometheus authenticates with `Authorization: Bearer <METRICS_TOKEN>`;
+# an empty token disables the endpoint.
+METRICS_DIR = ''
+METRICS_TOKEN = ''
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
@@ -78,6 +159,12 @@ TEMPLATES = [
         },
     },
 ]
+if TEMPLATE_TIMING:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [('core.loaders.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ])]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
@@ -146,9 +233,29 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Internal nginx location for X-Accel-Redirect, e.g. '/protected-media/'.
+# Empty means Django streams media files itself.
+MEDIA_ACCEL_REDIRECT_PREFIX = ''
+
+# Uploads
+# https://docs.djangoproject.com/en/2.2/topics/http/file-uploads/
+
+FILE_UPLOAD_HANDLERS = [
+    'core.uploadhandlers.MaxSizeUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+FILE_UPLOAD_MAX_SIZE = 5 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 25 * 1000 * 1000
+
+# Background tasks
+# Run the queue with `python manage.py run_worker`. With TASKS_EAGER the
+# tasks run inline in enqueue(), which is handy for local debugging.
+
+TASKS_EAGER = False
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.MetricsLocMemCache',
     }
 }
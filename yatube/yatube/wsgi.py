@@ -1,7 +1,10 @@
 import os
 
+from core import startup  # Первым: засекает начало загрузки воркера.
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+startup.mark('setup')
+startup.track_first_response()